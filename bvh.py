@@ -0,0 +1,226 @@
+"""BVH motion capture files as NumPy arrays, with vectorized forward kinematics and no Blender dependency.
+
+    positions, joint_links = load_bvh_poses("./assets/motion/131_03.bvh")
+    render_pose_sequence(positions, joint_links)
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+_AXES = {"X": 0, "Y": 1, "Z": 2}
+
+
+class BVHMotion(NamedTuple):
+    """Skeleton and motion of a BVH file, joints are in file order so parents come before their children.
+
+    Attributes:
+        joint_names (list[str]): Name of every joint, end sites are named `<parent>_End`.
+        parents (np.ndarray): (J,) parent index of every joint, -1 for the root.
+        offsets (np.ndarray): (J, 3) rest offset of every joint from its parent.
+        channels (list[tuple[str, ...]]): Channel names of every joint, e.g. ("Zrotation", "Yrotation", "Xrotation").
+        channel_starts (np.ndarray): (J,) column of the first channel of every joint in `motion`.
+        motion (np.ndarray): (T, C) channel values of every frame, angles in degrees.
+        frame_time (float): Seconds per frame.
+    """
+
+    joint_names: list[str]
+    parents: np.ndarray
+    offsets: np.ndarray
+    channels: list[tuple[str, ...]]
+    channel_starts: np.ndarray
+    motion: np.ndarray
+    frame_time: float
+
+    @property
+    def fps(self) -> float:
+        return 1.0 / self.frame_time
+
+    @property
+    def joint_links(self) -> np.ndarray:
+        """(L, 2) parent and child index of every bone with a length, zero offsets would draw nothing."""
+        children = np.flatnonzero((self.parents >= 0) & (np.abs(self.offsets).sum(axis=1) > 0))
+        return np.stack([self.parents[children], children], axis=1).astype(np.int32)
+
+
+def parse_bvh(text: str, include_end_sites: bool = True) -> BVHMotion:
+    """Parse the HIERARCHY and MOTION blocks of a BVH file.
+
+    Args:
+        text (str): Content of the file.
+        include_end_sites (bool, optional): Keep end sites as joints without channels, e.g. toe and finger tips.
+            Defaults to True.
+
+    Returns:
+        BVHMotion: Skeleton and channel values.
+    """
+    hierarchy, motion_block = text.split("MOTION", 1)
+    tokens = hierarchy.split()
+
+    joint_names: list[str] = []
+    parents: list[int] = []
+    offsets: list[list[float]] = []
+    channels: list[tuple[str, ...]] = []
+    stack: list[int] = []
+    idx = 0
+    while idx < len(tokens):
+        token = tokens[idx]
+        if token in ("ROOT", "JOINT"):
+            joint_names.append(tokens[idx + 1])
+            parents.append(stack[-1] if stack else -1)
+            offsets.append([0.0, 0.0, 0.0])
+            channels.append(())
+            idx += 2
+        elif token == "End":
+            if include_end_sites:
+                joint_names.append(joint_names[stack[-1]] + "_End")
+                parents.append(stack[-1])
+                offsets.append([0.0, 0.0, 0.0])
+                channels.append(())
+                idx += 2
+            else:
+                # Skip "End Site { OFFSET x y z }"
+                idx = tokens.index("}", idx) + 1
+        elif token == "{":
+            stack.append(len(joint_names) - 1)
+            idx += 1
+        elif token == "}":
+            stack.pop()
+            idx += 1
+        elif token == "OFFSET":
+            offsets[-1] = [float(value) for value in tokens[idx + 1 : idx + 4]]
+            idx += 4
+        elif token == "CHANNELS":
+            count = int(tokens[idx + 1])
+            channels[-1] = tuple(tokens[idx + 2 : idx + 2 + count])
+            idx += 2 + count
+        else:
+            idx += 1
+
+    header, after_time = motion_block.split("Frame Time:", 1)
+    num_frames = int(header.split("Frames:", 1)[1])
+    tokens_after_time = after_time.split()
+    num_channels = sum(len(joint_channels) for joint_channels in channels)
+    motion = np.array(tokens_after_time[1:], dtype=np.float64).reshape(num_frames, num_channels)
+
+    channel_counts = np.array([len(joint_channels) for joint_channels in channels], dtype=np.int64)
+    return BVHMotion(
+        joint_names=joint_names,
+        parents=np.array(parents, dtype=np.int64),
+        offsets=np.array(offsets, dtype=np.float64),
+        channels=channels,
+        channel_starts=np.concatenate([[0], np.cumsum(channel_counts)[:-1]]),
+        motion=motion,
+        frame_time=float(tokens_after_time[0]),
+    )
+
+
+def load_bvh(bvh_path: str, include_end_sites: bool = True) -> BVHMotion:
+    """Read and parse a BVH file, see `parse_bvh`."""
+    with open(bvh_path) as bvh_file:
+        return parse_bvh(bvh_file.read(), include_end_sites)
+
+
+def euler_to_matrices(angles: np.ndarray, axes: np.ndarray) -> np.ndarray:
+    """Rotation matrices of intrinsic euler rotations, applied in the order of their channels as BVH does.
+
+    Args:
+        angles (np.ndarray): (..., J, 3) angles in degrees.
+        axes (np.ndarray): (J, 3) axis index (0 for X, 1 for Y, 2 for Z) of every angle.
+
+    Returns:
+        np.ndarray: (..., J, 3, 3) rotation matrices.
+    """
+    radians = np.radians(angles)
+    cos, sin = np.cos(radians), np.sin(radians)
+    matrices = np.broadcast_to(np.eye(3), angles.shape[:-1] + (3, 3))
+    for slot in range(3):
+        c, s = cos[..., slot], sin[..., slot]
+        one, zero = np.ones_like(c), np.zeros_like(c)
+        rotations = np.stack(
+            [
+                np.stack([one, zero, zero, zero, c, -s, zero, s, c], axis=-1),
+                np.stack([c, zero, s, zero, one, zero, -s, zero, c], axis=-1),
+                np.stack([c, -s, zero, s, c, zero, zero, zero, one], axis=-1),
+            ],
+            axis=-2,
+        ).reshape(c.shape + (3, 3, 3))
+        # Pick the rotation about the axis of this slot for every joint
+        slot_rotations = rotations[..., np.arange(c.shape[-1]), axes[:, slot], :, :]
+        matrices = matrices @ slot_rotations
+    return matrices
+
+
+def local_transforms(motion: BVHMotion) -> tuple[np.ndarray, np.ndarray]:
+    """Local rotations and translations of every joint in every frame.
+
+    Joints with position channels, usually only the root, are translated by their channel values instead of their
+    offset. Joints without rotation channels, e.g. end sites, are not rotated.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (T, J, 3, 3) rotation matrices and (T, J, 3) translations.
+    """
+    num_frames, num_joints = len(motion.motion), len(motion.joint_names)
+    angles = np.zeros((num_frames, num_joints, 3))
+    axes = np.tile(np.arange(3), (num_joints, 1))
+    translations = np.broadcast_to(motion.offsets, (num_frames, num_joints, 3)).copy()
+
+    for joint, (joint_channels, start) in enumerate(zip(motion.channels, motion.channel_starts)):
+        rotation_slot = 0
+        for column, channel in enumerate(joint_channels, start):
+            axis = _AXES[channel[0].upper()]
+            if channel.endswith("rotation"):
+                angles[:, joint, rotation_slot] = motion.motion[:, column]
+                axes[joint, rotation_slot] = axis
+                rotation_slot += 1
+            else:
+                translations[:, joint, axis] = motion.motion[:, column]
+
+    return euler_to_matrices(angles, axes), translations
+
+
+def world_positions(parents: np.ndarray, rotations: np.ndarray, translations: np.ndarray) -> np.ndarray:
+    """Forward kinematics, vectorized over frames. Joints must come after their parents.
+
+    Args:
+        parents (np.ndarray): (J,) parent index of every joint, -1 for the root.
+        rotations (np.ndarray): (T, J, 3, 3) local rotations.
+        translations (np.ndarray): (T, J, 3) local translations from the parent.
+
+    Returns:
+        np.ndarray: (T, J, 3) world positions.
+    """
+    world_rotations = np.empty_like(rotations)
+    positions = np.empty_like(translations)
+    for joint, parent in enumerate(parents):
+        if parent < 0:
+            world_rotations[:, joint] = rotations[:, joint]
+            positions[:, joint] = translations[:, joint]
+            continue
+        parent_rotation = world_rotations[:, parent]
+        positions[:, joint] = positions[:, parent] + (parent_rotation @ translations[:, joint, :, None])[..., 0]
+        world_rotations[:, joint] = parent_rotation @ rotations[:, joint]
+    return positions
+
+
+def forward_kinematics(motion: BVHMotion) -> np.ndarray:
+    """(T, J, 3) world positions of all joints in every frame, in the units and y-up frame of the file."""
+    rotations, translations = local_transforms(motion)
+    return world_positions(motion.parents, rotations, translations)
+
+
+def to_camera_frame(positions: np.ndarray) -> np.ndarray:
+    """Rotate y-up, z-forward BVH positions 180 degrees about x to the y-down frame of `render_pose` inputs, so
+    that the skeleton stands upright and faces the camera."""
+    return positions * np.array([1.0, -1.0, -1.0])
+
+
+def load_bvh_poses(bvh_path: str, include_end_sites: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """Joint positions of every frame of a BVH file, ready for `render_pose_sequence`.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (T, J, 3) float32 positions and (L, 2) int32 joint links.
+    """
+    motion = load_bvh(bvh_path, include_end_sites)
+    positions = to_camera_frame(forward_kinematics(motion))
+    return positions.astype(np.float32), motion.joint_links
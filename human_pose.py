@@ -4,62 +4,242 @@
 """
 
 import argparse
+import functools
 import json
 import math
 import os
+import subprocess
 import sys
-from typing import Callable, List, Tuple
+import time
+import traceback
+from contextlib import contextmanager
+from multiprocessing.connection import Connection
+from typing import IO, Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 import bpy
 import numpy as np
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import utils  # noqa
+from pose_standardization import SCOPES, standardize_poses  # noqa
+
+SCRIPT_START_TIME = time.time()
+
+class GeometryLOD(NamedTuple):
+    """Tessellation of the joint spheres and limbs at one level of detail."""
+
+    sphere_segments: int
+    sphere_rings: int
+    subdivision_level: int
+    curve_resolution: int
+    bevel_resolution: int
+    limb_segments: int
+
+
+# Geometry level of detail, from full detail (0) to thumbnails. Level 0 is the original geometry.
+GEOMETRY_LODS = [
+    GeometryLOD(
+        sphere_segments=32,
+        sphere_rings=16,
+        subdivision_level=1,
+        curve_resolution=64,
+        bevel_resolution=5,
+        limb_segments=16,
+    ),
+    GeometryLOD(
+        sphere_segments=24,
+        sphere_rings=12,
+        subdivision_level=1,
+        curve_resolution=8,
+        bevel_resolution=3,
+        limb_segments=12,
+    ),
+    GeometryLOD(
+        sphere_segments=16,
+        sphere_rings=8,
+        subdivision_level=0,
+        curve_resolution=2,
+        bevel_resolution=1,
+        limb_segments=8,
+    ),
+    GeometryLOD(
+        sphere_segments=8,
+        sphere_rings=4,
+        subdivision_level=0,
+        curve_resolution=1,
+        bevel_resolution=0,
+        limb_segments=6,
+    ),
+]
+# Smallest projected joint radius in pixels at which each level is used
+LOD_MIN_JOINT_PIXELS = [16.0, 6.0, 2.5, 0.0]
+
+RENDER_ENGINES = ("CYCLES", "BLENDER_EEVEE", "BLENDER_WORKBENCH")
+
+PIXEL_DTYPES = ("float32", "uint8")
+
+RESOLUTION = (1080, 1080)
+CAMERA_LOCATION = (0.0, -8.0, 2.0)
+CAMERA_LENS = 85.0
+# The track-to constraint aims with Y up, which is undefined when looking straight down
+MAX_CAMERA_ELEVATION = 89.0
+
+
+class StageTimer:
+    def __init__(self) -> None:
+        """Wall-clock durations of pipeline stages, written as JSON lines keyed by job id.
+
+        Stages inside the render itself (scene sync, BVH build, sampling, denoising, compositing and image write)
+        are told apart by the status messages blender passes to the render handlers, see `add_render_handlers`.
+        """
+        self.job_id = ""
+        self.path: Optional[str] = None
+        self.records: List[Dict[str, Any]] = []
+        self._render_stage: Optional[str] = None
+        self._render_stage_start = 0.0
+
+    def record(self, stage: str, start: float, end: float, **extra: Any) -> None:
+        self.records.append(dict(job_id=self.job_id, stage=stage, start=start, duration=end - start, **extra))
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.time()
+        yield
+        self.record(name, start, time.time())
+
+    @contextmanager
+    def image_write(self) -> Iterator[None]:
+        """Time the script saving or reading back a render that blender does not write itself, as the same
+        "image_write" stage that the render handlers record for written images."""
+        if self._render_stage != "image_write":
+            self._switch_render_stage("image_write")
+        yield
+        self._switch_render_stage(None)
+
+    def flush(self) -> None:
+        """Append the records to `path` and forget them. Without a path they are kept for the caller to collect."""
+        if not self.path:
+            return
+        with open(self.path, "a") as timings_file:
+            for record in self.records:
+                timings_file.write(json.dumps(record) + "\n")
+        self.records = []
+
+    def _switch_render_stage(self, stage: Optional[str]) -> None:
+        now = time.time()
+        if self._render_stage is not None:
+            self.record(self._render_stage, self._render_stage_start, now, frame=bpy.context.scene.frame_current)
+        self._render_stage = stage
+        self._render_stage_start = now
+
+    def _on_render_pre(self, *args) -> None:
+        self._switch_render_stage("scene_sync")
+
+    def _on_render_stats(self, stats: str, *args) -> None:
+        # e.g. "... | Building BVH", "... | Sample 10/128", "... | Denoising", "... | Compositing"
+        status = stats.rsplit("|", 1)[-1]
+        if "BVH" in status:
+            stage = "bvh_build"
+        elif "Sample" in status or "Path Tracing" in status:
+            stage = "sampling"
+        elif "Denois" in status:
+            stage = "denoising"
+        elif "Composit" in status:
+            stage = "compositing"
+        else:
+            return
+        if stage != self._render_stage:
+            self._switch_render_stage(stage)
+
+    def _on_render_post(self, *args) -> None:
+        self._switch_render_stage("image_write")
+
+    def _on_render_write(self, *args) -> None:
+        self._switch_render_stage(None)
+        self.flush()
+
+    def add_render_handlers(self) -> None:
+        bpy.app.handlers.render_pre.append(self._on_render_pre)
+        bpy.app.handlers.render_stats.append(self._on_render_stats)
+        bpy.app.handlers.render_post.append(self._on_render_post)
+        bpy.app.handlers.render_write.append(self._on_render_write)
+
+
+timer = StageTimer()
 
 
 class Skeleton:
     def __init__(
         self,
-        joint_coordinates: List[List[float]],
-        joint_links: List[List[int]],
+        joint_coordinates: np.ndarray,
+        joint_links: np.ndarray,
         rgb: Tuple[float, float, float] = (0.1, 0.2, 0.6),
         alpha: float = 1,
         metallic: float = 0.5,
         specular: float = 0.5,
         roughness: float = 0.9,
         shadow_on: bool = True,
+        instance_joints: bool = False,
+        mesh_limbs: bool = False,
+        lod: int = 0,
+        offset: Tuple[float, float, float] = (0.0, 0.0, 0.0),
     ) -> None:
         """Blender object collection for a 3D pose/skeleton
 
         Args:
-            joint_coordinates (List[List[float]]): x,y,z of all joints
-            joint_links ([List[List[int, int]]]):
-                List of links to draw limbs connecting joints.
+            joint_coordinates (np.ndarray): (J, 3) x,y,z of all joints
+            joint_links (np.ndarray): (L, 2) links to draw limbs connecting joints.
             rgb (Tuple[float, float, float], optional): Defaults to (0.1, 0.2, 0.6).
             alpha (float, optional): Transparency of whole skeleton. Defaults to 1.
             metallic (float, optional): Defaults to 0.5.
             specular (float, optional): Defaults to 0.5.
             roughness (float, optional): Defaults to 0.9.
             shadow_on (bool, optional): Enable shadows of skeleton. Defaults to True.
+            instance_joints (bool, optional): Draw all joints as instances of one sphere placed on the vertices
+                of a point mesh, for dense keypoint sets. Defaults to False.
+            mesh_limbs (bool, optional): Draw all limbs as cylinders of a single mesh instead of one bezier curve
+                per limb. Defaults to False.
+            lod (int, optional): Index into `GEOMETRY_LODS`, higher is coarser. Defaults to 0.
+            offset (Tuple[float, float, float], optional): Shift applied after standardization, e.g. a grid cell.
+                Defaults to (0.0, 0.0, 0.0).
         """
         self.metallic = metallic
         self.specular = specular
         self.roughness = roughness
         self.shadow_on = shadow_on
-        self.joint_coordinates = self._standardize(joint_coordinates)
-        self.rgba = rgb + (alpha,)
+        self.offset = np.array(offset, dtype=np.float64)
+        self.joint_coordinates = self._standardize(joint_coordinates) + self.offset
+        # (T, J, 3) coordinates keyframed by set_pose_keyframes, the initial pose alone until then
+        self.keyframe_coordinates = self.joint_coordinates[None]
+        self.rgba = tuple(rgb) + (alpha,)
         self.joint_radius = 0.07
-        self.joint_links = joint_links
+        self.joint_links = np.asarray(joint_links, dtype=np.int64)
+        self.instance_joints = instance_joints
+        self.joint_instancer: Optional[bpy.types.Object] = None
+        self.limb_radius = 0.04
+        self.mesh_limbs = mesh_limbs
+        if not 0 <= lod < len(GEOMETRY_LODS):
+            raise ValueError("Unknown level of detail {}, expected 0 to {}".format(lod, len(GEOMETRY_LODS) - 1))
+        self.lod = GEOMETRY_LODS[lod]
+        self.limb_segments = self.lod.limb_segments
 
         self.joints = self.create_joints()
         self.limbs = self.create_limbs()
 
-        # TODO make different set_principled_node to use different materials
-        set_materials(self.joints, self.set_principled_node_skeleton, "Material_Joints")
-        set_materials(self.limbs, self.set_principled_node_skeleton, "Material_Limbs")
+        # Joints and limbs share one material, and skeletons of the same color reuse it
+        set_materials(self.joints + self.limbs, self.principled_params())
+
+    def create_limbs(self) -> List[bpy.types.Object]:
+        """Blender objects for limbs - Splines, or a single mesh of cylinders with `mesh_limbs`."""
+        if self.mesh_limbs:
+            vertices, _ = limb_cylinders(
+                self.joint_coordinates, self.joint_links, self.limb_radius, self.limb_segments
+            )
+            topology = limb_topology(len(self.joint_links), self.limb_segments)
+            limb_mesh_object = utils.create_mesh_from_numpy(bpy.context.scene, vertices, topology, "Limbs", "Limbs")
+            limb_mesh_object.cycles_visibility.shadow = self.shadow_on
+            return [limb_mesh_object]
 
-    def create_limbs(self) -> List[object]:
-        """Blender objects for limbs - Splines."""
         limbs = []
         for idx, connection in enumerate(self.joint_links):
             draw_curve = bpy.data.curves.new("draw_curve" + str(idx), "CURVE")
@@ -70,67 +250,235 @@ class Skeleton:
             bpy.context.collection.objects.link(curve)
 
             # Curve settings for new curve
-            draw_curve.resolution_u = 64
+            draw_curve.resolution_u = self.lod.curve_resolution
             draw_curve.fill_mode = "FULL"
-            draw_curve.bevel_depth = 0.04
-            draw_curve.bevel_resolution = 5
+            draw_curve.bevel_depth = self.limb_radius
+            draw_curve.bevel_resolution = self.lod.bevel_resolution
 
             # Assign bezier points to selection object locations
-            for i in range(len(connection)):
-                p = spline.bezier_points[i]
-                p.co = self.joint_coordinates[connection[i]]
+            for p in spline.bezier_points:
                 p.handle_right_type = "VECTOR"
                 p.handle_left_type = "VECTOR"
+            self._set_limb_points(spline, connection)
 
-            bpy.context.view_layer.objects.active = curve
-            bpy.ops.object.mode_set(mode="OBJECT")
-            bpy.context.object.cycles_visibility.shadow = self.shadow_on
+            curve.cycles_visibility.shadow = self.shadow_on
             limbs.append(curve)
 
         return limbs
 
-    def create_joints(self) -> List[object]:
-        """Blender objects for joint - Spheres."""
+    def _set_limb_points(self, spline: bpy.types.Spline, connection: List[int]) -> None:
+        """Place the two bezier points of a limb with handles on the segment, as vector handles would be."""
+        start = self.joint_coordinates[connection[0]]
+        end = self.joint_coordinates[connection[1]]
+        third = (end - start) / 3.0
+        for p, co in zip(spline.bezier_points, (start, end)):
+            p.co = co
+            p.handle_left = co - third
+            p.handle_right = co + third
+
+    def create_joints(self) -> List[bpy.types.Object]:
+        """Blender objects for joint - Spheres.
+        With `instance_joints` it is a single sphere instanced on the vertices of `joint_instancer`."""
+        if self.instance_joints:
+            sphere = self._create_joint_sphere(name="Joint")
+            self.joint_instancer = utils.create_vertex_instances(
+                bpy.context.scene, self.joint_coordinates, sphere, name="Joints"
+            )
+            return [sphere]
+
         joint_objs = []
 
         for x, y, z in self.joint_coordinates:
-            obj = utils.create_smooth_sphere(location=(x, y, z), radius=self.joint_radius)
+            obj = self._create_joint_sphere(location=(x, y, z), link=False)
             joint_objs.append(obj)
+        utils.link_objects(joint_objs)
 
         return joint_objs
 
-    def set_principled_node_skeleton(self, principled_node: bpy.types.Node) -> None:
-        """sets required properties for the particular material."""
-        utils.set_principled_node(
-            principled_node=principled_node,
-            base_color=self.rgba,
-            metallic=self.metallic,
-            specular=self.specular,
-            roughness=self.roughness,
+    def _create_joint_sphere(
+        self, location: Tuple[float, float, float] = (0.0, 0.0, 0.0), name: Optional[str] = None, link: bool = True
+    ) -> bpy.types.Object:
+        """A joint sphere tessellated at the level of detail of the skeleton."""
+        return utils.create_data_smooth_sphere(
+            location=location,
+            radius=self.joint_radius,
+            subdivision_level=self.lod.subdivision_level,
+            name=name,
+            segments=self.lod.sphere_segments,
+            ring_count=self.lod.sphere_rings,
+            link=link,
         )
 
+    def set_pose(self, joint_coordinates: np.ndarray) -> None:
+        """Move the existing joints and limbs to a new pose with the same joints and links.
+
+        Args:
+            joint_coordinates (np.ndarray): (J, 3) x,y,z of all joints
+        """
+        self.joint_coordinates = self._standardize(joint_coordinates) + self.offset
+
+        if self.joint_instancer is not None:
+            utils.set_mesh_vertices(self.joint_instancer.data, self.joint_coordinates)
+        else:
+            for joint, location in zip(self.joints, self.joint_coordinates):
+                joint.location = location
+
+        self._update_limbs()
+
+    def _update_limbs(self) -> None:
+        """Move the limbs to the current `joint_coordinates`."""
+        if self.mesh_limbs:
+            vertices, _ = limb_cylinders(self.joint_coordinates, self.joint_links, self.limb_radius, self.limb_segments)
+            utils.set_mesh_vertices(self.limbs[0].data, vertices)
+            return
+
+        for limb, connection in zip(self.limbs, self.joint_links):
+            self._set_limb_points(limb.data.splines[0], connection)
+
+    def set_pose_keyframes(self, frames: np.ndarray, poses: np.ndarray, scope: str = "pose") -> None:
+        """Animate the joints and limbs through a pose sequence with bulk written keyframes.
+        Mesh limbs can not be keyframed per vertex cheaply, they are moved by a frame change handler instead.
+
+        Keys are interpolated linearly, so poses may be reduced to keyframes, see `motion_resampling.reduce_keyframes`.
+        The standardized coordinates are kept in `keyframe_coordinates`.
+
+        Args:
+            frames (np.ndarray): (T,) increasing frame number of each pose.
+            poses (np.ndarray): (T, J, 3) x,y,z of all joints for every frame.
+            scope (str, optional): Standardize every "pose" on its own, or the whole "sequence" with one scale and
+                floor so that the skeleton does not jitter. Defaults to "pose".
+        """
+        coordinates = standardize_poses(poses, scope)[0] + self.offset
+        self.keyframe_coordinates = coordinates
+        self.joint_coordinates = coordinates[0]
+
+        if self.joint_instancer is not None:
+            points = self.joint_instancer.data
+            for joint_idx in range(coordinates.shape[1]):
+                data_path = "vertices[{}].co".format(joint_idx)
+                utils.set_keyframes(points, data_path, frames, coordinates[:, joint_idx], "LINEAR")
+        else:
+            for joint_idx, joint in enumerate(self.joints):
+                utils.set_keyframes(joint, "location", frames, coordinates[:, joint_idx], "LINEAR")
+
+        if self.mesh_limbs:
+            self._add_limb_frame_handler(np.asarray(frames, dtype=np.float64), coordinates)
+            return
+
+        for limb, connection in zip(self.limbs, self.joint_links):
+            start = coordinates[:, connection[0]]
+            end = coordinates[:, connection[1]]
+            third = (end - start) / 3.0
+            for point_idx, co in enumerate((start, end)):
+                data_path = "splines[0].bezier_points[{}].".format(point_idx)
+                utils.set_keyframes(limb.data, data_path + "co", frames, co, "LINEAR")
+                utils.set_keyframes(limb.data, data_path + "handle_left", frames, co - third, "LINEAR")
+                utils.set_keyframes(limb.data, data_path + "handle_right", frames, co + third, "LINEAR")
+
+    def _add_limb_frame_handler(self, frames: np.ndarray, coordinates: np.ndarray) -> None:
+        """Update the mesh limbs on frame change, linearly interpolating between the keyed frames."""
+
+        def update_limbs(scene: bpy.types.Scene, *args) -> None:
+            position = np.interp(scene.frame_current, frames, np.arange(len(frames)))
+            idx = min(int(position), len(frames) - 2) if len(frames) > 1 else 0
+            weight = position - idx
+            self.joint_coordinates = coordinates[idx] * (1.0 - weight)
+            if weight > 0.0:
+                self.joint_coordinates = self.joint_coordinates + coordinates[idx + 1] * weight
+            self._update_limbs()
+
+        # The handler edits mesh data while rendering
+        bpy.context.scene.render.use_lock_interface = True
+        bpy.app.handlers.frame_change_pre.append(update_limbs)
+
+    def principled_params(self) -> Dict[str, Any]:
+        """`utils.set_principled_node` parameters of the skeleton material."""
+        return dict(base_color=self.rgba, metallic=self.metallic, specular=self.specular, roughness=self.roughness)
+
     @staticmethod
-    def _standardize(joint_coordinates: List[List[float]]) -> np.ndarray:
+    def _standardize(joint_coordinates: np.ndarray) -> np.ndarray:
         """Standardize all poses to certain range for consistency with camera angle, floor, zoom etc."""
         coordinates: np.ndarray = np.array(joint_coordinates)
 
         assert coordinates.shape[-1] == 3, "[x,y,z] values are required"
         assert coordinates.dtype != np.dtype("object"), "2D list not uniform"
 
-        # rearrange data - might not be required for every dataset
-        coordinates[:, 1] *= -1
-        coordinates = coordinates[:, [0, 2, 1]]
+        return standardize_poses(coordinates)[0]
+
 
-        # scale to unit length
-        coordinates = coordinates / np.max(coordinates)
+def limb_cylinders(
+    joint_coordinates: np.ndarray, joint_links: np.ndarray, radius: float, segments: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Open cylinders along all links, the joint spheres cover the ends.
 
-        # make lowest point as origin -> so above floor
-        coordinates -= coordinates[coordinates[:, -1].argmin()]
+    Args:
+        joint_coordinates (np.ndarray): (J, 3) x,y,z of all joints.
+        joint_links (np.ndarray): (L, 2) joint indices of the limbs.
+        radius (float): Radius of the cylinders.
+        segments (int): Vertices around each cylinder.
 
-        elevation = 0.1
-        coordinates[:, 2] += elevation
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (L * 2 * segments, 3) vertices and (L * segments, 4) quad faces.
+    """
+    links = np.asarray(joint_links, dtype=np.int64)
+    starts = joint_coordinates[links[:, 0]]
+    ends = joint_coordinates[links[:, 1]]
 
-        return coordinates
+    # Orthonormal frame around every limb axis
+    direction = ends - starts
+    length = np.linalg.norm(direction, axis=1, keepdims=True)
+    # Coincident joints get a fixed axis, their cylinder collapses to a ring hidden by the joint sphere
+    direction = np.where(length > 1e-8, direction / np.maximum(length, 1e-8), [[0.0, 0.0, 1.0]])
+    helper = np.where(np.abs(direction[:, 2:3]) < 0.9, [[0.0, 0.0, 1.0]], [[1.0, 0.0, 0.0]])
+    u = np.cross(direction, helper)
+    u /= np.linalg.norm(u, axis=1, keepdims=True)
+    v = np.cross(direction, u)
+
+    angles = np.linspace(0.0, 2.0 * math.pi, segments, endpoint=False)
+    ring = radius * (np.cos(angles)[None, :, None] * u[:, None] + np.sin(angles)[None, :, None] * v[:, None])
+    vertices = np.stack([starts[:, None] + ring, ends[:, None] + ring], axis=1).reshape(-1, 3)
+
+    return vertices, limb_cylinder_faces(len(links), segments)
+
+
+def limb_cylinder_faces(num_links: int, segments: int) -> np.ndarray:
+    """(num_links * segments, 4) quads between the start and end rings of `limb_cylinders`, facing outwards."""
+    ring_idx = np.arange(segments)
+    next_idx = (ring_idx + 1) % segments
+    quad = np.stack([ring_idx, next_idx, next_idx + segments, ring_idx + segments], axis=1)
+    return (quad[None] + (2 * segments * np.arange(num_links))[:, None, None]).reshape(-1, 4)
+
+
+@functools.lru_cache(maxsize=16)
+def limb_topology(num_links: int, segments: int) -> utils.MeshTopology:
+    """Mesh topology of the limb cylinders, shared by all skeletons with as many limbs at the same level of detail."""
+    return utils.compute_mesh_topology(limb_cylinder_faces(num_links, segments))
+
+
+def select_lod(
+    resolution_px: float,
+    camera_distance: float,
+    joint_radius: float = 0.07,
+    lens: float = 85.0,
+    sensor_width: float = 36.0,
+) -> int:
+    """Pick the coarsest geometry level at which a joint still covers enough pixels.
+
+    Args:
+        resolution_px (float): Rendered image width in pixels.
+        camera_distance (float): Distance from the camera to the skeleton.
+        joint_radius (float, optional): Joint sphere radius. Defaults to 0.07.
+        lens (float, optional): Focal length in mm. Defaults to 85.0.
+        sensor_width (float, optional): Sensor width in mm. Defaults to 36.0.
+
+    Returns:
+        int: Index into `GEOMETRY_LODS`.
+    """
+    joint_px = joint_radius * lens / sensor_width * resolution_px / camera_distance
+    for level, min_px in enumerate(LOD_MIN_JOINT_PIXELS):
+        if joint_px >= min_px:
+            return level
+    return len(LOD_MIN_JOINT_PIXELS) - 1
 
 
 class Floor:
@@ -144,12 +492,12 @@ class Floor:
         self.specular = 0.5
         self.roughness = 0.0
 
-        self.plane = utils.create_plane(size=self.size, name="Floor")
-        set_materials([self.plane], self.set_principled_node_floor, "Material_Floor")
+        self.plane = utils.create_data_plane(size=self.size, name="Floor")
+        set_materials([self.plane], self.principled_params())
 
-    def set_principled_node_floor(self, principled_node: bpy.types.Node) -> None:
-        utils.set_principled_node(
-            principled_node=principled_node,
+    def principled_params(self) -> Dict[str, Any]:
+        """`utils.set_principled_node` parameters of the floor material."""
+        return dict(
             base_color=self.base_color,
             subsurface=self.subsurface,
             subsurface_color=self.subsurface_color,
@@ -160,15 +508,10 @@ class Floor:
         )
 
 
-def set_materials(objects: List[object], principled_node_setter: Callable, name: str) -> None:
-    mat = utils.add_material(name, use_nodes=True, make_node_tree_empty=True)
-    nodes = mat.node_tree.nodes
-    links = mat.node_tree.links
-    output_node = nodes.new(type="ShaderNodeOutputMaterial")
-    principled_node = nodes.new(type="ShaderNodeBsdfPrincipled")
-    principled_node_setter(principled_node)
-    links.new(principled_node.outputs["BSDF"], output_node.inputs["Surface"])
-
+def set_materials(objects: List[bpy.types.Object], principled_params: Dict[str, Any]) -> None:
+    """Assign the material of `principled_params` to all objects, see `utils.add_principled_material`. Skeletons,
+    batches and worker jobs with the same parameters reuse one material instead of building and compiling a copy."""
+    mat = utils.add_principled_material(**principled_params)
     for obj in objects:
         obj.data.materials.append(mat)
 
@@ -180,6 +523,7 @@ def parse_arguments():
         argv = sys.argv[sys.argv.index("--") + 1 :]
 
     parser = argparse.ArgumentParser()
+    parser.add_argument("--payload", type=str, help="Directory of .npy pose arrays written by the host.")
     parser.add_argument("--pose", type=str)
     parser.add_argument("--joint_links", type=str)
     parser.add_argument("--color", type=float, nargs=3)
@@ -189,50 +533,99 @@ def parse_arguments():
     parser.add_argument("--output_path", type=str)
     parser.add_argument("--resolution_percentage", type=int)
     parser.add_argument("--samplings", type=int)
+    parser.add_argument("--batch", action="store_true", help="Render each pose of a batch to numbered outputs.")
+    parser.add_argument("--animation", action="store_true", help="Animate a pose sequence, use with --render-anim.")
+    parser.add_argument("--fps", type=int, default=24)
+    parser.add_argument("--standardize", type=str, default="pose", choices=SCOPES[:2], help="Scope of --animation.")
+    parser.add_argument("--views", type=float, nargs="+", help="Azimuth, elevation, distance of every camera view.")
+    parser.add_argument("--grid", type=int, nargs=2, help="Rows and columns of a grid of all poses in one image.")
+    parser.add_argument("--labels", type=str, help="JSON list of a label per grid cell.")
+    parser.add_argument("--turntable", type=int, help="Render this many views evenly spaced around the skeleton.")
+    parser.add_argument("--instance_joints", action="store_true", help="Instance one sphere for all joints.")
+    parser.add_argument("--mesh_limbs", action="store_true", help="Draw limbs as one mesh of cylinders.")
+    parser.add_argument("--lod", type=int, help="Force a geometry level of detail, 0 is the finest.")
+    parser.add_argument("--engine", type=str, default="CYCLES", choices=RENDER_ENGINES)
+    parser.add_argument("--device", type=str, default="GPU", choices=("GPU", "CPU"), help="Cycles device.")
+    parser.add_argument("--threads", type=int, default=0, help="CPU render threads, 0 uses all cores.")
+    parser.add_argument("--tile_size", type=int, help="CPU render tile size in pixels.")
+    parser.add_argument("--calibrate", type=str, help="Time CPU thread and tile settings, write them as JSON here.")
+    parser.add_argument("--thread_counts", type=int, nargs="+", help="Thread counts tried with --calibrate.")
+    parser.add_argument("--tile_sizes", type=int, nargs="+", help="Tile sizes tried with --calibrate.")
+    parser.add_argument("--video_path", type=str, help="Stream --batch or --animation frames into this video.")
+    parser.add_argument("--ffmpeg_path", type=str, help="Encode videos with ffmpeg, else write a .y4m stream.")
+    parser.add_argument("--pixels_path", type=str, help="Render without an image file, store pixels in this .npy.")
+    parser.add_argument("--pixels_dtype", type=str, default="float32", choices=PIXEL_DTYPES)
+    parser.add_argument("--template_stamp", type=str, help="Version of the static scene, reused when it matches.")
+    parser.add_argument("--template_path", type=str, help="Save the static scene as a template .blend here.")
+    parser.add_argument("--job_id", type=str, default="")
+    parser.add_argument("--timings_path", type=str, help="Append stage timings as JSON lines to this file.")
+    parser.add_argument("--spawn_time", type=float, help="Host time.time() when blender was launched.")
+    parser.add_argument("--worker_fds", type=int, nargs=2, help="Read/write pipe fds to serve jobs as a worker.")
 
     # Only parse python args
     args = parser.parse_known_args(argv)[0]
     return args
 
 
-def render_image():
-    """The method invoked by blender cli that renders the output image."""
+def set_renderer(
+    scene: bpy.types.Scene,
+    camera_object: bpy.types.Object,
+    samplings: int,
+    engine: str,
+    device: str = "GPU",
+    threads: int = 0,
+    tile_size: Optional[int] = None,
+) -> None:
+    """Render engine settings, `engine` is one of `RENDER_ENGINES`.
+    Cycles on the "CPU" `device` skips the GPU probe and uses `threads` (0 for all cores) and `tile_size`."""
+    if engine == "CYCLES":
+        use_cpu_only = device == "CPU"
+        utils.set_cycles_renderer(scene, camera_object, samplings, use_transparent_bg=True, use_cpu_only=use_cpu_only)
+        if use_cpu_only:
+            utils.set_cpu_performance(scene, threads, tile_size)
+    elif engine == "BLENDER_EEVEE":
+        utils.set_eevee_renderer(scene, camera_object, samplings, use_transparent_bg=True)
+    elif engine == "BLENDER_WORKBENCH":
+        utils.set_workbench_renderer(scene, camera_object, use_transparent_bg=True)
+    else:
+        raise ValueError("Unknown render engine {}, expected one of {}".format(engine, RENDER_ENGINES))
 
-    # Args
-    args = parse_arguments()
-    args.color = tuple(args.color)
-    args.gt_color = tuple(args.gt_color)
 
-    # Load poses from JSON strings
-    pose = np.array(json.loads(args.pose))
-    joint_links = np.array(json.loads(args.joint_links))
-    gt_pose = np.array(json.loads(args.gt_pose)) if args.gt_pose else None
-    gt_joint_links = np.array(json.loads(args.gt_joint_links)) if args.gt_joint_links else None
+def create_static_scene_objects(
+    scene: bpy.types.Scene,
+    resolution_percentage: int,
+    samplings: int,
+    engine: str,
+    device: str = "GPU",
+    threads: int = 0,
+    tile_size: Optional[int] = None,
+) -> Tuple[bpy.types.Object, bpy.types.Object]:
+    """Reset the scene and build everything that does not depend on the pose: floor, light, camera, background
+    and render settings, see `set_renderer`. The objects are tagged with a `template_object` property.
 
-    # Scene Building
-    scene = bpy.data.scenes["Scene"]
+    All objects and the data they leave without users are removed first, see `utils.clean_scene`.
+
+    Returns:
+        Tuple[bpy.types.Object, bpy.types.Object]: The camera and its focus target.
+    """
     world = scene.world
 
     # Reset
-    utils.clean_objects()
+    clean_start = time.time()
+    freed = utils.clean_scene()
+    timer.record("clean_objects", clean_start, time.time(), freed=freed)
 
-    # Create all objects
-    assert len(args.color) == 3
-    skeleton = Skeleton(pose, joint_links, shadow_on=True, rgb=args.color)
-    if gt_pose is not None:
-        assert len(args.gt_color) == 3
-        if gt_joint_links is None:
-            raise ValueError("GT joint link must be passed along with pose.")
-        _ = Skeleton(gt_pose, gt_joint_links, shadow_on=True, rgb=args.gt_color)
+    with timer.stage("floor"):
+        floor = Floor(size=20.0)
 
-    _ = Floor(size=20.0)
+    light_camera_start = time.time()
 
     # Lighting based on asset
     # hdri_path = "./assets/HDRIs/green_point_park_2k.hdr"
     # utils.build_environment_texture_background(world, hdri_path)
 
     # Custom Light
-    utils.create_area_light(
+    light_object = utils.create_data_area_light(
         location=(4.0, -3.0, 6.0),
         rotation=(0.0, math.pi * 60.0 / 180.0, -math.pi * 32.0 / 180.0),
         size=0.50,
@@ -241,31 +634,835 @@ def render_image():
         name="Main Light",
     )
 
-    # camera focus - pelvis or any point. Could check manually to verify best placing.
-    focus_location = (
-        skeleton.joint_coordinates[0][0],
-        skeleton.joint_coordinates[0][1],
-        skeleton.joint_coordinates[0][2],
-    )
-    bpy.ops.object.empty_add(location=focus_location)
-    focus_target = bpy.context.object
+    # camera focus - pelvis or any point, it is moved to the skeleton once that is built.
+    focus_target = utils.create_data_empty(name="Focus")
 
     # Camera
-    bpy.ops.object.camera_add(location=(0.0, -8.0, 2.0))
-    camera_object = bpy.context.object
+    camera_object = utils.create_data_camera(CAMERA_LOCATION, name="Camera")
 
     utils.add_track_to_constraint(camera_object, focus_target)
-    utils.set_camera_params(camera_object.data, focus_target, lens=85, fstop=0.5)
+    utils.set_camera_params(camera_object.data, focus_target, lens=CAMERA_LENS, fstop=0.5)
 
     # Background
     utils.build_rgb_background(world, rgb=(1.0, 1.0, 1.0, 1.0))
+    timer.record("light_camera", light_camera_start, time.time())
 
     # Render Setting
-    res_x, res_y = 1080, 1080
+    with timer.stage("renderer_setup"):
+        utils.set_output_properties(scene, resolution_percentage, "", *RESOLUTION)
+        set_renderer(scene, camera_object, samplings, engine, device, threads, tile_size)
+
+    for obj in (floor.plane, light_object, focus_target, camera_object):
+        obj["template_object"] = True
+
+    return camera_object, focus_target
+
+
+def create_scene_objects(
+    pose: np.ndarray,
+    joint_links: np.ndarray,
+    color: Tuple[float, float, float],
+    gt_pose: Optional[np.ndarray] = None,
+    gt_joint_links: Optional[np.ndarray] = None,
+    gt_color: Optional[Tuple[float, float, float]] = None,
+    output_path: str = "",
+    resolution_percentage: int = 100,
+    samplings: int = 128,
+    instance_joints: bool = False,
+    mesh_limbs: bool = False,
+    lod: Optional[int] = None,
+    engine: str = "CYCLES",
+    template_stamp: Optional[str] = None,
+    template_path: Optional[str] = None,
+    offset: Tuple[float, float, float] = (0.0, 0.0, 0.0),
+    device: str = "GPU",
+    threads: int = 0,
+    tile_size: Optional[int] = None,
+) -> Tuple[Skeleton, Optional[Skeleton], bpy.types.Object]:
+    """Build skeletons, floor, light, camera and render settings for one pose.
+
+    The geometry level of detail is picked from the projected joint size unless `lod` forces one.
+    `engine` is one of `RENDER_ENGINES`; Eevee and Workbench give fast previews of the same scene.
+    `device`, `threads` and `tile_size` are passed to `set_renderer`.
+
+    When the open scene carries `template_stamp`, e.g. a template .blend passed to blender or the previous job of
+    a worker, only the skeletons are replaced and the data they leave without users is purged, so that memory
+    stays flat over many jobs. The counts of freed datablocks are recorded with the "clean_objects" stage.
+    Otherwise the static scene is rebuilt, stamped and, with `template_path`, saved as a template for later runs.
+
+    Returns:
+        Tuple[Skeleton, Optional[Skeleton], bpy.types.Object]: Skeleton, GT skeleton and the camera focus target.
+    """
+
+    # Scene Building
+    scene = bpy.data.scenes["Scene"]
+
+    if template_stamp is not None and scene.get("template_stamp") == template_stamp:
+        clean_start = time.time()
+        freed = utils.clean_scene(keep=[obj for obj in bpy.data.objects if obj.get("template_object")])
+        timer.record("clean_objects", clean_start, time.time(), freed=freed)
+        camera_object = bpy.data.objects["Camera"]
+        focus_target = bpy.data.objects["Focus"]
+
+        # Views and grids move the camera and resize the floor
+        camera_object.location = CAMERA_LOCATION
+        bpy.data.objects["Floor"].scale = (1.0, 1.0, 1.0)
+
+        # Device preferences are not stored in .blend files
+        with timer.stage("renderer_setup"):
+            set_renderer(scene, camera_object, samplings, engine, device, threads, tile_size)
+    else:
+        camera_object, focus_target = create_static_scene_objects(
+            scene, resolution_percentage, samplings, engine, device, threads, tile_size
+        )
+        if template_stamp is not None:
+            scene["template_stamp"] = template_stamp
+            if template_path:
+                with timer.stage("template_save"):
+                    bpy.ops.wm.save_as_mainfile(filepath=os.path.abspath(template_path), copy=True)
+
+    utils.set_output_properties(scene, resolution_percentage, output_path, *RESOLUTION)
+
+    if lod is None:
+        focus = Skeleton._standardize(pose)[0]
+        distance = float(np.linalg.norm(np.array(CAMERA_LOCATION) - focus))
+        lod = select_lod(RESOLUTION[0] * resolution_percentage / 100, distance, lens=CAMERA_LENS)
+
+    # Create all objects
+    assert len(color) == 3
+    with timer.stage("skeleton"):
+        skeleton = Skeleton(
+            pose,
+            joint_links,
+            rgb=color,
+            shadow_on=True,
+            instance_joints=instance_joints,
+            mesh_limbs=mesh_limbs,
+            lod=lod,
+            offset=offset,
+        )
+        gt_skeleton = None
+        if gt_pose is not None:
+            assert gt_color is not None and len(gt_color) == 3
+            if gt_joint_links is None:
+                raise ValueError("GT joint link must be passed along with pose.")
+            gt_skeleton = Skeleton(
+                gt_pose,
+                gt_joint_links,
+                rgb=gt_color,
+                shadow_on=True,
+                instance_joints=instance_joints,
+                mesh_limbs=mesh_limbs,
+                lod=lod,
+                offset=offset,
+            )
+
+    # camera focus - pelvis or any point. Could check manually to verify best placing.
+    focus_target.location = skeleton.joint_coordinates[0]
+
+    return skeleton, gt_skeleton, focus_target
+
+
+def render_batch(
+    poses: np.ndarray,
+    joint_links: np.ndarray,
+    color: Tuple[float, float, float],
+    gt_poses: Optional[np.ndarray] = None,
+    gt_joint_links: Optional[np.ndarray] = None,
+    gt_color: Optional[Tuple[float, float, float]] = None,
+    output_path: str = "",
+    resolution_percentage: int = 100,
+    samplings: int = 128,
+    video_path: Optional[str] = None,
+    fps: int = 24,
+    ffmpeg_path: Optional[str] = None,
+    **scene_options,
+) -> None:
+    """Build the scene once and render every pose of a batch by only moving the skeleton joints and limbs.
+
+    Images are written as `<output_path><index>.png` with 1-based, 4 digit indices like an animation, or with
+    `video_path` streamed as frames of a video, see `VideoSink`. Remaining keyword arguments are passed to
+    `create_scene_objects`.
+    """
+    scene = bpy.data.scenes["Scene"]
+    skeleton, gt_skeleton, focus_target = create_scene_objects(
+        poses[0],
+        joint_links,
+        color,
+        gt_pose=gt_poses[0] if gt_poses is not None else None,
+        gt_joint_links=gt_joint_links,
+        gt_color=gt_color,
+        output_path=output_path,
+        resolution_percentage=resolution_percentage,
+        samplings=samplings,
+        **scene_options,
+    )
+
+    sink = None
+    if video_path:
+        utils.build_viewer_composition(scene)
+        scale = resolution_percentage / 100
+        width, height = int(scene.render.resolution_x * scale), int(scene.render.resolution_y * scale)
+        sink = VideoSink(video_path, width, height, fps, ffmpeg_path)
+
+    try:
+        for idx in range(len(poses)):
+            if idx > 0:
+                skeleton.set_pose(poses[idx])
+                if gt_skeleton is not None and gt_poses is not None:
+                    gt_skeleton.set_pose(gt_poses[idx])
+                focus_target.location = skeleton.joint_coordinates[0]
+
+            # Output file names are numbered by the current frame
+            scene.frame_current = idx + 1
+            if sink is None:
+                bpy.ops.render.render(write_still=True)
+                continue
 
-    utils.set_output_properties(scene, args.resolution_percentage, args.output_path, res_x, res_y)
+            bpy.ops.render.render()
+            with timer.image_write():
+                sink.write(read_render_pixels())
+    finally:
+        if sink is not None:
+            sink.close()
+
+
+def build_animation(
+    poses: np.ndarray,
+    joint_links: np.ndarray,
+    color: Tuple[float, float, float],
+    gt_poses: Optional[np.ndarray] = None,
+    gt_joint_links: Optional[np.ndarray] = None,
+    gt_color: Optional[Tuple[float, float, float]] = None,
+    output_path: str = "",
+    resolution_percentage: int = 100,
+    samplings: int = 128,
+    fps: int = 24,
+    standardize: str = "pose",
+    frames: Optional[np.ndarray] = None,
+    **scene_options,
+) -> None:
+    """Build the scene once and keyframe the skeletons through a (T, J, 3) pose sequence, standardized per "pose"
+    or once per "sequence".
+
+    Frames are rendered by blender with `--render-anim` to `<output_path><frame>.png`, starting from frame 1.
+    With `frames`, the poses are keyframes at those increasing frame numbers and the frames between them are
+    interpolated linearly, the animation ends at the last of them. Remaining keyword arguments are passed to
+    `create_scene_objects`.
+    """
+    scene = bpy.data.scenes["Scene"]
+    skeleton, gt_skeleton, focus_target = create_scene_objects(
+        poses[0],
+        joint_links,
+        color,
+        gt_pose=gt_poses[0] if gt_poses is not None else None,
+        gt_joint_links=gt_joint_links,
+        gt_color=gt_color,
+        output_path=output_path,
+        resolution_percentage=resolution_percentage,
+        samplings=samplings,
+        **scene_options,
+    )
+
+    frames = np.arange(1, len(poses) + 1) if frames is None else np.asarray(frames, dtype=np.int64)
+    skeleton.set_pose_keyframes(frames, poses, standardize)
+    if gt_skeleton is not None and gt_poses is not None:
+        gt_skeleton.set_pose_keyframes(frames, gt_poses, standardize)
+    utils.set_keyframes(focus_target, "location", frames, skeleton.keyframe_coordinates[:, 0], "LINEAR")
+
+    utils.set_animation(scene, fps=fps, frame_start=1, frame_end=int(frames[-1]))
+
+
+def turntable_views(count: int, elevation: float = 10.0, distance: float = 8.0) -> List[Tuple[float, float, float]]:
+    """`count` views evenly spaced around the skeleton, starting from the front."""
+    return [(360.0 * k / count, elevation, distance) for k in range(count)]
+
+
+def set_camera_view(
+    camera_object: bpy.types.Object, target: np.ndarray, azimuth: float, elevation: float, distance: float
+) -> None:
+    """Place the camera on a sphere around `target`, the track-to constraint keeps it aimed.
+
+    Args:
+        camera_object (bpy.types.Object): Camera tracking the focus target.
+        target (np.ndarray): x,y,z of the focus target.
+        azimuth (float): Degrees counter-clockwise seen from above, 0 is the front view from -y.
+        elevation (float): Degrees above the horizontal plane of the target, clamped to +-`MAX_CAMERA_ELEVATION`
+            so that 90 gives a nearly top view.
+        distance (float): Distance from the target.
+    """
+    elevation = max(-MAX_CAMERA_ELEVATION, min(elevation, MAX_CAMERA_ELEVATION))
+    azimuth, elevation = math.radians(azimuth), math.radians(elevation)
+    direction = np.array(
+        (math.sin(azimuth) * math.cos(elevation), -math.cos(azimuth) * math.cos(elevation), math.sin(elevation))
+    )
+    camera_object.location = np.asarray(target) + distance * direction
+
+
+def render_views(
+    pose: np.ndarray,
+    joint_links: np.ndarray,
+    color: Tuple[float, float, float],
+    gt_pose: Optional[np.ndarray] = None,
+    gt_joint_links: Optional[np.ndarray] = None,
+    gt_color: Optional[Tuple[float, float, float]] = None,
+    output_path: str = "",
+    resolution_percentage: int = 100,
+    samplings: int = 128,
+    views: Optional[List[Tuple[float, float, float]]] = None,
+    **scene_options,
+) -> None:
+    """Build the scene once and render it from several cameras, see `set_camera_view`.
+
+    Render data persists between views, so Cycles builds the BVH once. Images are written as
+    `<output_path>_view<k>.png`. Remaining keyword arguments are passed to `create_scene_objects`.
+    """
+    scene = bpy.data.scenes["Scene"]
+    skeleton, _, focus_target = create_scene_objects(
+        pose,
+        joint_links,
+        color,
+        gt_pose=gt_pose,
+        gt_joint_links=gt_joint_links,
+        gt_color=gt_color,
+        output_path=output_path,
+        resolution_percentage=resolution_percentage,
+        samplings=samplings,
+        **scene_options,
+    )
+    scene.render.use_persistent_data = True
+
+    camera_object = scene.camera
+    for k, (azimuth, elevation, distance) in enumerate(views or turntable_views(1)):
+        set_camera_view(camera_object, skeleton.joint_coordinates[0], azimuth, elevation, distance)
+        bpy.ops.render.render()
+        with timer.image_write():
+            image_path = bpy.path.abspath("{}_view{}.png".format(output_path, k))
+            bpy.data.images["Render Result"].save_render(filepath=image_path, scene=scene)
+
+
+def grid_offsets(
+    coordinates: np.ndarray, rows: int, cols: int, label_height: float = 0.0, spacing: float = 0.4
+) -> Tuple[np.ndarray, float, float]:
+    """Skeleton offsets that center standardized poses in the cells of an upright grid facing the front camera.
+
+    Args:
+        coordinates (np.ndarray): (N, J, 3) standardized poses, N <= rows * cols, filled row by row from the top.
+        rows (int): Number of grid rows.
+        cols (int): Number of grid columns.
+        label_height (float, optional): Room below every skeleton for its label. Defaults to 0.0.
+        spacing (float, optional): Gap between neighbouring cells. Defaults to 0.4.
+
+    Returns:
+        Tuple[np.ndarray, float, float]: (N, 3) offsets, and the width and height of the whole grid.
+    """
+    lower = coordinates.min(axis=1)
+    upper = coordinates.max(axis=1)
+    cell_width = (upper[:, 0] - lower[:, 0]).max() + spacing
+    cell_height = upper[:, 2].max() + label_height + spacing
+
+    cells = np.arange(len(coordinates))
+    offsets = np.zeros((len(coordinates), 3))
+    offsets[:, 0] = (cells % cols - (cols - 1) / 2.0) * cell_width - (lower[:, 0] + upper[:, 0]) / 2.0
+    offsets[:, 1] = -(lower[:, 1] + upper[:, 1]) / 2.0
+    offsets[:, 2] = (rows - 1 - cells // cols) * cell_height + label_height
+    return offsets, cols * cell_width, rows * cell_height
+
+
+def build_grid(
+    poses: np.ndarray,
+    joint_links: np.ndarray,
+    color: Tuple[float, float, float],
+    gt_poses: Optional[np.ndarray] = None,
+    gt_joint_links: Optional[np.ndarray] = None,
+    gt_color: Optional[Tuple[float, float, float]] = None,
+    output_path: str = "",
+    resolution_percentage: int = 100,
+    samplings: int = 128,
+    grid: Tuple[int, int] = (1, 1),
+    labels: Optional[List[str]] = None,
+    instance_joints: bool = False,
+    mesh_limbs: bool = False,
+    lod: Optional[int] = None,
+    **scene_options,
+) -> None:
+    """Build one scene with every pose, and its GT pose, standing in a cell of a `grid` (rows, cols), rendered as
+    a single image.
+
+    The image aspect follows the grid and the camera is moved back until every cell fits. Optional `labels`
+    are written below the skeletons. Remaining keyword arguments are passed to `create_scene_objects`.
+    """
+    rows, cols = grid
+    if len(poses) == 0:
+        raise ValueError("At least one pose is required for a grid")
+    if len(poses) > rows * cols:
+        raise ValueError("{} poses do not fit a {}x{} grid".format(len(poses), rows, cols))
+
+    label_height = 0.3 if labels else 0.0
+    coordinates = standardize_poses(poses)[0]
+    if gt_poses is not None:
+        gt_coordinates = standardize_poses(gt_poses)[0]
+        coordinates = np.concatenate([coordinates, gt_coordinates], axis=1)
+    offsets, width, height = grid_offsets(coordinates, rows, cols, label_height)
+
+    # Longest image side keeps the scene resolution, the horizontal field of view is fixed by the sensor
+    long_side = max(RESOLUTION)
+    res_x = long_side if width >= height else int(round(long_side * width / height))
+    res_y = long_side if height >= width else int(round(long_side * height / width))
+    half_fov = math.atan(36.0 / 2.0 / CAMERA_LENS)
+    distance = 1.1 * max(width / 2.0, height / 2.0 * res_x / res_y) / math.tan(half_fov) + np.ptp(coordinates[..., 1])
+    if lod is None:
+        lod = select_lod(res_x * resolution_percentage / 100, distance, lens=CAMERA_LENS)
+
+    scene = bpy.data.scenes["Scene"]
+    _, _, focus_target = create_scene_objects(
+        poses[0],
+        joint_links,
+        color,
+        gt_pose=gt_poses[0] if gt_poses is not None else None,
+        gt_joint_links=gt_joint_links,
+        gt_color=gt_color,
+        output_path=output_path,
+        resolution_percentage=resolution_percentage,
+        samplings=samplings,
+        instance_joints=instance_joints,
+        mesh_limbs=mesh_limbs,
+        lod=lod,
+        offset=tuple(offsets[0]),
+        **scene_options,
+    )
+    # Poses, links and color of the skeletons in every cell, checked by create_scene_objects for the first cell
+    skeleton_sets = [(poses, joint_links, color)]
+    if gt_poses is not None:
+        assert gt_joint_links is not None and gt_color is not None
+        skeleton_sets.append((gt_poses, gt_joint_links, gt_color))
+
+    with timer.stage("grid"):
+        for idx in range(1, len(poses)):
+            for set_poses, set_joint_links, set_color in skeleton_sets:
+                Skeleton(
+                    set_poses[idx],
+                    set_joint_links,
+                    rgb=set_color,
+                    shadow_on=True,
+                    instance_joints=instance_joints,
+                    mesh_limbs=mesh_limbs,
+                    lod=lod,
+                    offset=tuple(offsets[idx]),
+                )
+
+        if labels:
+            centers = (coordinates.min(axis=1) + coordinates.max(axis=1)) / 2.0 + offsets
+            label_objects = []
+            for idx, label in enumerate(labels[: len(poses)]):
+                location = (centers[idx, 0], 0.0, offsets[idx, 2] - 0.05)
+                text = utils.create_text(
+                    scene,
+                    str(label),
+                    "Label{}".format(idx),
+                    align_y="TOP",
+                    size=0.15,
+                    location=location,
+                    rotation=(90.0, 0.0, 0.0),
+                )
+                label_objects.append(text)
+            set_materials(label_objects, {"base_color": (0.05, 0.05, 0.05, 1.0)})
+
+    # The floor is sized for a single skeleton
+    floor_scale = max(1.0, 2.0 * max(width, distance) / 20.0)
+    bpy.data.objects["Floor"].scale = (floor_scale, floor_scale, 1.0)
+
+    utils.set_output_properties(scene, resolution_percentage, output_path, res_x, res_y)
+    focus_target.location = (0.0, 0.0, height / 2.0)
+    set_camera_view(scene.camera, np.array(focus_target.location), 0.0, 0.0, distance)
+
+
+def calibrate_cpu(
+    pose: np.ndarray,
+    joint_links: np.ndarray,
+    color: Tuple[float, float, float],
+    gt_pose: Optional[np.ndarray] = None,
+    gt_joint_links: Optional[np.ndarray] = None,
+    gt_color: Optional[Tuple[float, float, float]] = None,
+    output_path: str = "",
+    resolution_percentage: int = 100,
+    samplings: int = 16,
+    thread_counts: Optional[List[int]] = None,
+    tile_sizes: Optional[List[int]] = None,
+    results_path: str = "",
+    **scene_options,
+) -> List[Dict[str, float]]:
+    """Time short CPU renders of the scene for every combination of thread count and tile size.
+
+    Render data persists between the runs and a first render warms up the kernels and the BVH, so the timings only
+    cover sampling. The results are written as JSON to `results_path` when given.
+
+    Returns:
+        List[Dict[str, float]]: `{"threads", "tile_size", "seconds"}` of every combination.
+    """
+    thread_counts = thread_counts or [0]
+    tile_sizes = tile_sizes or [32]
+    scene = bpy.data.scenes["Scene"]
+    create_scene_objects(
+        pose,
+        joint_links,
+        color,
+        gt_pose=gt_pose,
+        gt_joint_links=gt_joint_links,
+        gt_color=gt_color,
+        output_path=output_path,
+        resolution_percentage=resolution_percentage,
+        samplings=samplings,
+        device="CPU",
+        threads=thread_counts[0],
+        tile_size=tile_sizes[0],
+        **scene_options,
+    )
+    scene.render.use_persistent_data = True
+    bpy.ops.render.render()
+
+    results = []
+    for threads in thread_counts:
+        for tile_size in tile_sizes:
+            utils.set_cpu_performance(scene, threads, tile_size)
+            start = time.time()
+            bpy.ops.render.render()
+            results.append({"threads": threads, "tile_size": tile_size, "seconds": time.time() - start})
+
+    if results_path:
+        with open(results_path, "w") as results_file:
+            json.dump(results, results_file)
+    return results
+
+
+def render_pixels(pixels_path: str, dtype: str = "float32") -> None:
+    """Render the scene without writing an image file and store the pixels in a `.npy` file for the host to map.
+
+    Pixels are (H, W, 4) RGBA with the top row first. `dtype` is one of `PIXEL_DTYPES`, float32 pixels are linear
+    scene light and uint8 pixels are sRGB encoded, without the view transform applied to saved images.
+    """
+    if dtype not in PIXEL_DTYPES:
+        raise ValueError("Unknown pixel dtype {}, expected one of {}".format(dtype, PIXEL_DTYPES))
+
+    scene = bpy.data.scenes["Scene"]
+    utils.build_viewer_composition(scene)
+    bpy.ops.render.render()
+
+    with timer.image_write():
+        rgba = read_render_pixels()
+        pixels = np.lib.format.open_memmap(pixels_path, mode="w+", dtype=dtype, shape=rgba.shape)
+        pixels[:] = srgb_uint8(rgba) if dtype == "uint8" else rgba
+        pixels.flush()
+        del pixels
+
+
+def read_render_pixels() -> np.ndarray:
+    """(H, W, 4) float32 linear RGBA of the last render with the top row first, needs `build_viewer_composition`."""
+    image = bpy.data.images["Viewer Node"]
+    width, height = image.size
+    rgba = np.empty(width * height * 4, dtype=np.float32)
+    image.pixels.foreach_get(rgba)
+    return rgba.reshape(height, width, 4)[::-1]
+
+
+def srgb_uint8(linear: np.ndarray) -> np.ndarray:
+    """sRGB encode the color channels of linear pixels to uint8, a fourth alpha channel is only quantized."""
+    values = np.clip(linear, 0.0, 1.0)
+    color = values[..., :3]
+    encoded = np.empty_like(values)
+    encoded[..., :3] = np.where(color <= 0.0031308, 12.92 * color, 1.055 * np.power(color, 1.0 / 2.4) - 0.055)
+    encoded[..., 3:] = values[..., 3:]
+    return np.rint(encoded * 255.0).astype(np.uint8)
+
+
+class VideoSink:
+    def __init__(
+        self,
+        video_path: str,
+        width: int,
+        height: int,
+        fps: int,
+        ffmpeg_path: Optional[str] = None,
+        background: Tuple[float, float, float] = (1.0, 1.0, 1.0),
+    ) -> None:
+        """Frames written one by one into a video, so no image files are kept while rendering.
+
+        With `ffmpeg_path` the frames are piped as raw RGB into an ffmpeg process that encodes them alongside the
+        rendering. Otherwise they are written by Python as an uncompressed YUV 4:4:4 `.y4m` stream, which players
+        and encoders read directly.
+
+        Frames are plain sRGB encodings of the linear render, the scene view transform is not applied. They match
+        images saved with the "Standard" view transform, and have more contrast than the default "Filmic" of
+        Blender 2.8 to 3.x.
+
+        Args:
+            video_path (str): Output video, its extension picks the ffmpeg container.
+            width (int): Frame width in pixels.
+            height (int): Frame height in pixels.
+            fps (int): Frame rate.
+            ffmpeg_path (Optional[str], optional): ffmpeg executable. Defaults to None, the built-in writer.
+            background (Tuple[float, float, float], optional): Linear RGB behind transparent pixels, videos
+                have no alpha. Defaults to (1.0, 1.0, 1.0).
+        """
+        self.video_path = video_path
+        self.width = width
+        self.height = height
+        self.background = np.array(background, dtype=np.float32)
+        self.process: Optional[subprocess.Popen] = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(video_path)), exist_ok=True)
+        if ffmpeg_path:
+            command = [
+                ffmpeg_path,
+                "-v",
+                "warning",
+                "-y",
+                "-f",
+                "rawvideo",
+                "-pix_fmt",
+                "rgb24",
+                "-s",
+                "{}x{}".format(width, height),
+                "-r",
+                str(fps),
+                "-i",
+                "-",
+                # yuv420p needs even dimensions
+                "-vf",
+                "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                "-pix_fmt",
+                "yuv420p",
+                video_path,
+            ]
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+            assert self.process.stdin is not None
+            self.stream: IO[bytes] = self.process.stdin
+        else:
+            self.stream = open(video_path, "wb")
+            self.stream.write("YUV4MPEG2 W{} H{} F{}:1 Ip A1:1 C444\n".format(width, height, fps).encode())
+
+    def write(self, rgba: np.ndarray) -> None:
+        """Append a (H, W, 4) linear, premultiplied RGBA frame with the top row first."""
+        rgb = rgba[..., :3] + (1.0 - rgba[..., 3:]) * self.background
+        rgb = srgb_uint8(rgb)
+        if self.process is not None:
+            self.stream.write(rgb.tobytes())
+            return
+
+        # BT.601 limited range, as y4m players assume
+        weights = np.array(
+            [[65.481, 128.553, 24.966], [-37.797, -74.203, 112.0], [112.0, -93.786, -18.214]], dtype=np.float32
+        )
+        yuv = rgb.astype(np.float32) / 255.0 @ weights.T + np.array([16.0, 128.0, 128.0], dtype=np.float32)
+        planes = np.rint(yuv).clip(0, 255).astype(np.uint8).transpose(2, 0, 1)
+        self.stream.write(b"FRAME\n")
+        self.stream.write(np.ascontiguousarray(planes).tobytes())
+
+    def close(self) -> None:
+        """Finish the video, waits for the encoder."""
+        try:
+            self.stream.close()
+        except BrokenPipeError:
+            # ffmpeg exited early, its exit code tells that the video failed
+            pass
+        if self.process is not None and self.process.wait() != 0:
+            raise RuntimeError("ffmpeg failed to encode {}".format(self.video_path))
+
+
+def render_video(video_path: str, fps: int = 24, ffmpeg_path: Optional[str] = None) -> None:
+    """Render the frame range of the scene into a `VideoSink` instead of image files."""
+    scene = bpy.data.scenes["Scene"]
+    utils.build_viewer_composition(scene)
+    scale = scene.render.resolution_percentage / 100
+    width = int(scene.render.resolution_x * scale)
+    height = int(scene.render.resolution_y * scale)
+
+    sink = VideoSink(video_path, width, height, fps, ffmpeg_path)
+    try:
+        for frame in range(scene.frame_start, scene.frame_end + 1):
+            scene.frame_set(frame)
+            bpy.ops.render.render()
+            with timer.image_write():
+                sink.write(read_render_pixels())
+    finally:
+        sink.close()
+
+
+def load_payload(payload_dir: str) -> Dict[str, np.ndarray]:
+    """Memory-map the pose arrays written by `render_human_pose.save_payload`.
+
+    Args:
+        payload_dir (str): Directory with `pose.npy`, `joint_links.npy` and optionally the GT arrays and the
+            `frames.npy` keyframe numbers of an animation.
+
+    Returns:
+        Dict[str, np.ndarray]: Read-only arrays keyed by the `create_scene_objects` argument names.
+    """
+    payload = {}
+    for name in ("pose", "joint_links", "gt_pose", "gt_joint_links", "frames"):
+        path = os.path.join(payload_dir, name + ".npy")
+        if os.path.exists(path):
+            payload[name] = np.load(path, mmap_mode="r")
+    return payload
+
+
+def _current_rss_bytes() -> int:
+    """Resident set size of this Blender process, falls back to the peak RSS where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_worker(read_fd: int, write_fd: int) -> None:
+    """Serve render jobs sent by `render_human_pose.BlenderWorkerPool` until the pipe is closed.
+
+    Every job is a dict of `create_scene_objects` keyword arguments with the pose arrays in a `payload` dir.
+    The scene is rebuilt and rendered for each job, and a dict with the written image path, or the pixel `.npy`
+    path for jobs with a `pixels_dtype`, the stage timings and the current RSS (or the traceback on failure) is
+    sent back.
+
+    Args:
+        read_fd (int): Pipe fd the jobs are received on.
+        write_fd (int): Pipe fd the results are sent on.
+    """
+    jobs = Connection(read_fd, writable=False)
+    results = Connection(write_fd, readable=False)
+    scene = bpy.data.scenes["Scene"]
+    timer.add_render_handlers()
+
+    while True:
+        try:
+            job = jobs.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+
+        timer.job_id = job.pop("job_id", "")
+        pixels_dtype = job.pop("pixels_dtype", None)
+        try:
+            payload_dir = job.pop("payload")
+            payload = load_payload(payload_dir)
+            create_scene_objects(
+                payload["pose"],
+                payload["joint_links"],
+                gt_pose=payload.get("gt_pose"),
+                gt_joint_links=payload.get("gt_joint_links"),
+                **job,
+            )
+            if pixels_dtype is None:
+                bpy.ops.render.render(write_still=True)
+                result = {"ok": True, "image_path": scene.render.frame_path(frame=scene.frame_current)}
+            else:
+                pixels_path = os.path.join(payload_dir, "pixels.npy")
+                render_pixels(pixels_path, pixels_dtype)
+                result = {"ok": True, "pixels_path": pixels_path}
+        except Exception:
+            result = {"ok": False, "error": traceback.format_exc()}
+        result["timings"] = timer.records
+        timer.records = []
+        result["rss"] = _current_rss_bytes()
+        results.send(result)
+
+    jobs.close()
+    results.close()
+
+
+def render_image():
+    """The method invoked by blender cli that renders the output image."""
+
+    # Args
+    parse_start = time.time()
+    args = parse_arguments()
+
+    if args.worker_fds is not None:
+        run_worker(*args.worker_fds)
+        return
+
+    timer.job_id = args.job_id
+    timer.path = args.timings_path
+    timer.add_render_handlers()
+    if args.spawn_time is not None:
+        timer.record("blender_start", args.spawn_time, SCRIPT_START_TIME)
+
+    # Load poses from the payload or from JSON strings, a batch or sequence of poses with `--batch`/`--animation`
+    if args.payload:
+        payload = load_payload(args.payload)
+        pose = payload["pose"]
+        joint_links = payload["joint_links"]
+        gt_pose = payload.get("gt_pose")
+        gt_joint_links = payload.get("gt_joint_links")
+        frames = payload.get("frames")
+    else:
+        pose = np.array(json.loads(args.pose))
+        joint_links = np.array(json.loads(args.joint_links))
+        gt_pose = np.array(json.loads(args.gt_pose)) if args.gt_pose else None
+        gt_joint_links = np.array(json.loads(args.gt_joint_links)) if args.gt_joint_links else None
+        frames = None
+    timer.record("argument_parse", parse_start, time.time())
+
+    render_kwargs = {
+        "instance_joints": args.instance_joints,
+        "mesh_limbs": args.mesh_limbs,
+        "lod": args.lod,
+        "engine": args.engine,
+        "template_stamp": args.template_stamp,
+        "template_path": args.template_path,
+        "device": args.device,
+        "threads": args.threads,
+        "tile_size": args.tile_size,
+    }
+    if args.calibrate:
+        render = calibrate_cpu
+        # Calibration sets the CPU options itself
+        for name in ("device", "threads", "tile_size"):
+            render_kwargs.pop(name)
+        render_kwargs.update(results_path=args.calibrate, thread_counts=args.thread_counts, tile_sizes=args.tile_sizes)
+    elif args.animation:
+        render = build_animation
+        render_kwargs.update(fps=args.fps, standardize=args.standardize, frames=frames)
+    elif args.batch:
+        render = render_batch
+        render_kwargs.update(video_path=args.video_path, fps=args.fps, ffmpeg_path=args.ffmpeg_path)
+    elif args.grid:
+        render = build_grid
+        render_kwargs["grid"] = tuple(args.grid)
+        render_kwargs["labels"] = json.loads(args.labels) if args.labels else None
+    elif args.views or args.turntable:
+        render = render_views
+        render_kwargs["views"] = (
+            [tuple(view) for view in np.reshape(args.views, (-1, 3)).tolist()]
+            if args.views
+            else turntable_views(args.turntable)
+        )
+    else:
+        render = create_scene_objects
+
+    render(
+        pose,
+        joint_links,
+        tuple(args.color),
+        gt_pose,
+        gt_joint_links=gt_joint_links,
+        gt_color=tuple(args.gt_color) if args.gt_color else None,
+        output_path=args.output_path,
+        resolution_percentage=args.resolution_percentage,
+        samplings=args.samplings,
+        **render_kwargs,
+    )
+    if args.pixels_path:
+        render_pixels(args.pixels_path, args.pixels_dtype)
+    if args.animation and args.video_path:
+        render_video(args.video_path, args.fps, args.ffmpeg_path)
 
-    utils.set_cycles_renderer(scene, camera_object, args.samplings, use_transparent_bg=True)
+    # Scene building stages are written now, render stages once each frame is written
+    timer.flush()
 
 
 if __name__ == "__main__":
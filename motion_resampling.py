@@ -0,0 +1,150 @@
+"""Resample motion to a render frame rate and reduce it to the keyframes needed within a tolerance.
+
+Motion capture usually runs at 120 fps while renders run at 24 to 30 fps, so most captured frames would be evaluated
+and uploaded to Blender only to be skipped.
+"""
+
+import numpy as np
+
+from bvh import BVHMotion, local_transforms, world_positions
+
+
+def sample_times(num_frames: int, source_fps: float, target_fps: float) -> tuple[np.ndarray, np.ndarray]:
+    """Source frames around every target frame over the duration of the motion.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (T',) index of the source frame before every target frame, and (T',) weight
+            of the source frame after it.
+    """
+    duration = (num_frames - 1) / source_fps
+    num_samples = int(np.floor(duration * target_fps + 1e-6)) + 1
+    position = np.arange(num_samples) * (source_fps / target_fps)
+    before = np.minimum(np.floor(position).astype(np.int64), max(num_frames - 2, 0))
+    weight = np.clip(position - before, 0.0, 1.0) if num_frames > 1 else np.zeros(num_samples)
+    return before, weight
+
+
+def resample_poses(poses: np.ndarray, source_fps: float, target_fps: float) -> np.ndarray:
+    """Linearly interpolate (T, J, 3) joint positions to `target_fps`, first frames of both rates coincide."""
+    poses = np.asarray(poses)
+    before, weight = sample_times(len(poses), source_fps, target_fps)
+    after = np.minimum(before + 1, len(poses) - 1)
+    weight = weight[:, None, None]
+    return poses[before] * (1.0 - weight) + poses[after] * weight
+
+
+def matrices_to_quaternions(matrices: np.ndarray) -> np.ndarray:
+    """(..., 3, 3) rotation matrices to (..., 4) unit quaternions (w, x, y, z) with w >= 0."""
+    m = matrices
+    diagonal = np.stack([m[..., 0, 0], m[..., 1, 1], m[..., 2, 2]], axis=-1)
+    trace = diagonal.sum(axis=-1)
+    # 4w^2, 4x^2, 4y^2, 4z^2, dividing by the largest one is well conditioned
+    squares = np.concatenate([1.0 + trace[..., None], 1.0 + 2.0 * diagonal - trace[..., None]], axis=-1)
+    xw, yw, zw = m[..., 2, 1] - m[..., 1, 2], m[..., 0, 2] - m[..., 2, 0], m[..., 1, 0] - m[..., 0, 1]
+    xy, xz, yz = m[..., 0, 1] + m[..., 1, 0], m[..., 0, 2] + m[..., 2, 0], m[..., 1, 2] + m[..., 2, 1]
+    # Row k is 4 * q * q[k], scaled so that it can be normalized
+    candidates = np.stack(
+        [
+            np.stack([squares[..., 0], xw, yw, zw], axis=-1),
+            np.stack([xw, squares[..., 1], xy, xz], axis=-1),
+            np.stack([yw, xy, squares[..., 2], yz], axis=-1),
+            np.stack([zw, xz, yz, squares[..., 3]], axis=-1),
+        ],
+        axis=-2,
+    )
+    best = squares.argmax(axis=-1)
+    quaternions = np.take_along_axis(candidates, best[..., None, None], axis=-2)[..., 0, :]
+    quaternions /= np.linalg.norm(quaternions, axis=-1, keepdims=True)
+    return quaternions * np.where(quaternions[..., :1] < 0.0, -1.0, 1.0)
+
+
+def quaternions_to_matrices(quaternions: np.ndarray) -> np.ndarray:
+    """(..., 4) unit quaternions (w, x, y, z) to (..., 3, 3) rotation matrices."""
+    w, x, y, z = np.moveaxis(quaternions, -1, 0)
+    return np.stack(
+        [
+            np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)], axis=-1),
+            np.stack([2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)], axis=-1),
+            np.stack([2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)], axis=-1),
+        ],
+        axis=-2,
+    )
+
+
+def slerp(start: np.ndarray, end: np.ndarray, weight: np.ndarray) -> np.ndarray:
+    """Spherical linear interpolation of (..., 4) unit quaternions along the shorter arc, `weight` broadcasts
+    against (...,)."""
+    dot = np.sum(start * end, axis=-1)
+    end = np.where(dot[..., None] < 0.0, -end, end)
+    dot = np.clip(np.abs(dot), 0.0, 1.0)
+
+    angle = np.arccos(dot)
+    sin_angle = np.sin(angle)
+    # Nearly equal rotations fall back to normalized linear interpolation
+    nearly_equal = sin_angle < 1e-6
+    safe_sin = np.where(nearly_equal, 1.0, sin_angle)
+    start_weight = np.where(nearly_equal, 1.0 - weight, np.sin((1.0 - weight) * angle) / safe_sin)
+    end_weight = np.where(nearly_equal, weight, np.sin(weight * angle) / safe_sin)
+
+    result = start * start_weight[..., None] + end * end_weight[..., None]
+    return result / np.linalg.norm(result, axis=-1, keepdims=True)
+
+
+def resample_bvh(motion: BVHMotion, target_fps: float) -> np.ndarray:
+    """World joint positions of a BVH motion at `target_fps`, like `bvh.forward_kinematics` at the file rate.
+
+    Local joint rotations are interpolated with slerp and translations linearly before forward kinematics, so
+    limbs keep their length between captured frames.
+
+    Returns:
+        np.ndarray: (T', J, 3) world positions in the units and frame of the file.
+    """
+    rotations, translations = local_transforms(motion)
+    before, weight = sample_times(len(motion.motion), motion.fps, target_fps)
+    after = np.minimum(before + 1, len(motion.motion) - 1)
+
+    quaternions = matrices_to_quaternions(rotations)
+    joint_weight = np.broadcast_to(weight[:, None], (len(weight), len(motion.parents)))
+    resampled_rotations = quaternions_to_matrices(slerp(quaternions[before], quaternions[after], joint_weight))
+    weight = weight[:, None, None]
+    resampled_translations = translations[before] * (1.0 - weight) + translations[after] * weight
+    return world_positions(motion.parents, resampled_rotations, resampled_translations)
+
+
+def reduce_keyframes(poses: np.ndarray, tolerance: float) -> np.ndarray:
+    """Frames to keep so that linear interpolation between them reproduces every joint within `tolerance`.
+
+    Ramer-Douglas-Peucker over time: a span is split at its worst interpolated frame until all errors are within
+    the tolerance. The first and last frames are always kept.
+
+    Args:
+        poses (np.ndarray): (T, J, 3) joint positions, or (T, ...) of any shape per frame, e.g. a pose and its GT
+            pose concatenated along the joints.
+        tolerance (float): Largest allowed distance of an interpolated joint from its true position.
+
+    Returns:
+        np.ndarray: Sorted indices of the kept frames.
+    """
+    poses = np.asarray(poses, dtype=np.float64)
+    num_frames = len(poses)
+    if num_frames <= 2:
+        return np.arange(num_frames)
+    points = poses.reshape(num_frames, -1, poses.shape[-1])
+
+    keep = np.zeros(num_frames, dtype=bool)
+    keep[[0, -1]] = True
+    spans = [(0, num_frames - 1)]
+    while spans:
+        start, end = spans.pop()
+        if end - start < 2:
+            continue
+        weight = (np.arange(start + 1, end) - start)[:, None, None] / (end - start)
+        interpolated = points[start] * (1.0 - weight) + points[end] * weight
+        errors = np.linalg.norm(points[start + 1 : end] - interpolated, axis=-1).max(axis=-1)
+        worst = int(errors.argmax())
+        if errors[worst] > tolerance:
+            split = start + 1 + worst
+            keep[split] = True
+            spans += [(start, split), (split, end)]
+
+    return np.flatnonzero(keep)
@@ -0,0 +1,99 @@
+"""Vectorized standardization of poses to the scene frame of `human_pose.py`.
+
+Poses are rotated from the dataset frame, y down and z forward, to Blender's z up frame, scaled to unit length and
+lifted onto the floor. The scale and floor offset are computed per pose, per sequence or once for a whole dataset,
+and returned so that other points, e.g. cameras for 2D projections, can be mapped the same way.
+
+Runs both in Blender and on the host, so only NumPy and Python 3.7 features are used.
+"""
+
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+# Sets of poses sharing one transform, see `standardize_poses`
+SCOPES = ("pose", "sequence", "dataset")
+
+
+def swap_axes(points: np.ndarray) -> np.ndarray:
+    """Dataset frame to scene frame, (x, y, z) -> (x, z, -y)."""
+    return np.stack([points[..., 0], points[..., 2], -points[..., 1]], axis=-1)
+
+
+def unswap_axes(points: np.ndarray) -> np.ndarray:
+    """Scene frame to dataset frame, inverse of `swap_axes`."""
+    return np.stack([points[..., 0], -points[..., 2], points[..., 1]], axis=-1)
+
+
+class PoseTransform(NamedTuple):
+    """Scene point = swap_axes(point) * scale + offset, broadcast against the standardized poses.
+
+    Attributes:
+        scale (np.ndarray): (..., 1, 1) scale of every pose.
+        offset (np.ndarray): (..., 1, 3) offset of every pose in the scene frame.
+    """
+
+    scale: np.ndarray
+    offset: np.ndarray
+
+    def apply(self, points: np.ndarray) -> np.ndarray:
+        """Map (..., K, 3) dataset frame points the way their poses were standardized."""
+        return swap_axes(np.asarray(points)) * self.scale + self.offset
+
+    def invert(self, points: np.ndarray) -> np.ndarray:
+        """Map (..., K, 3) scene points back to the dataset frame."""
+        return unswap_axes((np.asarray(points) - self.offset) / self.scale)
+
+
+def standardize_poses(
+    poses: np.ndarray, scope: str = "pose", elevation: float = 0.1
+) -> Tuple[np.ndarray, PoseTransform]:
+    """Standardize poses for consistent camera framing: swap axes, scale so that the largest coordinate is 1 and move
+    the lowest joint to `elevation` above the origin.
+
+    The scale and the lowest joint are taken per `scope`:
+        - "pose": every pose on its own, the behaviour of a single render.
+        - "sequence": over the second to last but one axis as well, so a (T, J, 3) motion or every sequence of a
+          (S, T, J, 3) array keeps one scale and floor, and the framing does not jitter between frames.
+        - "dataset": once over all poses.
+
+    Args:
+        poses (np.ndarray): (..., J, 3) x,y,z of joints, e.g. (J, 3), (N, J, 3) or (S, T, J, 3).
+        scope (str, optional): One of `SCOPES`. Defaults to "pose".
+        elevation (float, optional): Height of the lowest joint above the floor. Defaults to 0.1.
+
+    Returns:
+        Tuple[np.ndarray, PoseTransform]: Standardized poses of the same shape, and their transform.
+    """
+    points = np.asarray(poses)
+    if points.dtype.kind != "f":
+        points = points.astype(np.float64)
+    if points.ndim < 2 or points.shape[-1] != 3:
+        raise ValueError("Poses of shape (..., J, 3) are required, got {}".format(points.shape))
+    if scope not in SCOPES:
+        raise ValueError("Unknown scope {}, expected one of {}".format(scope, SCOPES))
+
+    # Number of trailing axes before x,y,z that share a transform
+    if scope == "pose":
+        num_shared = 1
+    elif scope == "sequence":
+        num_shared = min(2, points.ndim - 1)
+    else:
+        num_shared = points.ndim - 1
+    leading = points.shape[: points.ndim - 1 - num_shared]
+    broadcast = leading + (1,) * num_shared
+
+    swapped = swap_axes(points)
+    flat = swapped.reshape(leading + (-1, 3))
+
+    scale = 1.0 / flat.max(axis=(-2, -1))
+    lowest_idx = flat[..., 2].argmin(axis=-1)
+    lowest = np.take_along_axis(flat, lowest_idx[..., None, None], axis=-2)[..., 0, :]
+
+    offset = -lowest * scale[..., None]
+    offset[..., 2] += elevation
+
+    transform = PoseTransform(
+        scale.reshape(broadcast + (1,)).astype(points.dtype), offset.reshape(broadcast + (3,)).astype(points.dtype)
+    )
+    return swapped * transform.scale + transform.offset, transform
@@ -0,0 +1,121 @@
+"""Content-addressed cache of rendered images, so repeated renders of the same inputs skip Blender."""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Optional
+
+import numpy as np
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+_source_version: Optional[str] = None
+
+
+def source_version() -> str:
+    """Hash of the scripts run by Blender and `utils`, so cached images are invalidated when the scene code changes."""
+    global _source_version
+    if _source_version is None:
+        digest = hashlib.sha256()
+        scripts = [os.path.join(_ROOT, name) for name in ("human_pose.py", "pose_standardization.py")]
+        for path in scripts + sorted(glob.glob(os.path.join(_ROOT, "utils", "*.py"))):
+            with open(path, "rb") as source:
+                digest.update(source.read())
+        _source_version = digest.hexdigest()[:16]
+    return _source_version
+
+
+def cache_key(arrays: dict[str, Any], options: dict[str, Any]) -> str:
+    """Hash of everything that affects a rendered image.
+
+    Args:
+        arrays (dict[str, Any]): Pose and link arrays, `None` values are allowed.
+        options (dict[str, Any]): JSON serializable render options such as colors, resolution and engine.
+
+    Returns:
+        str: Hex digest used as the cache key.
+    """
+    digest = hashlib.sha256(source_version().encode())
+    for name in sorted(arrays):
+        digest.update(name.encode())
+        if arrays[name] is not None:
+            # Same dtypes as the Blender payload, so lists and arrays of the same values share a key
+            dtype = np.int32 if name.endswith("joint_links") else np.float32
+            array = np.ascontiguousarray(arrays[name], dtype=dtype)
+            digest.update(str(array.shape).encode())
+            digest.update(array.tobytes())
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    def __init__(self, cache_dir: str, max_mb: float = 1024.0) -> None:
+        """PNG files named by their cache key, with least recently used eviction once `max_mb` is exceeded.
+
+        The index is a small JSON file in `cache_dir` holding the size and last access time of every entry.
+        Access is serialized within a process; processes sharing a cache dir may lose index updates but never
+        return a wrong image.
+
+        Args:
+            cache_dir (str): Directory of the cached images and `index.json`.
+            max_mb (float, optional): Size limit of the cached images in MiB. Defaults to 1024.0.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 2**20)
+        self._index_path = os.path.join(cache_dir, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _image_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".png")
+
+    def _load_index(self) -> dict[str, dict[str, float]]:
+        try:
+            with open(self._index_path) as index_file:
+                return json.load(index_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index: dict[str, dict[str, float]]) -> None:
+        temp_path = self._index_path + f".{os.getpid()}.tmp"
+        with open(temp_path, "w") as index_file:
+            json.dump(index, index_file)
+        os.replace(temp_path, self._index_path)
+
+    def fetch(self, key: str, output_image_path: str) -> bool:
+        """Copy the cached image of `key` to `output_image_path`.
+
+        Returns:
+            bool: False on a cache miss, nothing is written then.
+        """
+        with self._lock:
+            index = self._load_index()
+            cached_path = self._image_path(key)
+            if key not in index or not os.path.exists(cached_path):
+                return False
+            os.makedirs(os.path.dirname(os.path.abspath(output_image_path)), exist_ok=True)
+            shutil.copyfile(cached_path, output_image_path)
+            index[key]["last_access"] = time.time()
+            self._save_index(index)
+            return True
+
+    def store(self, key: str, image_path: str) -> None:
+        """Add a rendered image under `key` and evict the least recently used images beyond the size limit."""
+        with self._lock:
+            index = self._load_index()
+            shutil.copyfile(image_path, self._image_path(key))
+            index[key] = {"size": os.path.getsize(image_path), "last_access": time.time()}
+
+            total = sum(entry["size"] for entry in index.values())
+            for old_key in sorted(index, key=lambda k: index[k]["last_access"]):
+                if total <= self.max_bytes or old_key == key:
+                    break
+                total -= index.pop(old_key)["size"]
+                try:
+                    os.remove(self._image_path(old_key))
+                except OSError:
+                    pass
+            self._save_index(index)
@@ -1,5 +1,34 @@
+import hashlib
+import json
+import os
+import platform
+import queue
+import shutil
 import subprocess
-from typing import Optional
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from typing import Any, Optional, Union
+
+import numpy as np
+
+from motion_resampling import reduce_keyframes
+from pose_standardization import swap_axes
+from render_cache import RenderCache, cache_key, source_version
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "human_pose.py")
+
+# Payloads are small-lived, keep them in memory backed storage when the platform has it
+PAYLOAD_ROOT = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Number of `human_pose.GEOMETRY_LODS`, valid `lod` values are 0 to NUM_GEOMETRY_LODS - 1
+NUM_GEOMETRY_LODS = 4
+
+# Results of `tune_cpu_render`, keyed by machine, Blender and resolution
+CPU_TUNING_PATH = os.path.join(os.path.expanduser("~"), ".cache", "blender_human_pose", "cpu_tuning.json")
 
 
 def render_pose(
@@ -12,9 +41,23 @@ def render_pose(
     output_path: str = "./output/pose",
     resolution_percentage: int = 100,
     samplings: int = 128,
+    instance_joints: bool = False,
+    mesh_limbs: bool = False,
+    lod: Optional[int] = None,
+    engine: str = "CYCLES",
+    device: str = "GPU",
+    threads: int = 0,
+    tile_size: Optional[Union[int, str]] = None,
+    template_path: Optional[str] = None,
+    views: Optional[Union[list[tuple[float, float, float]], int]] = None,
+    pixels_dtype: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+    cache_max_mb: float = 1024.0,
+    job_id: Optional[str] = None,
+    return_timings: bool = False,
     blender_path: str = "blender",
     gui: bool = False,
-):
+) -> Union[str, list[str], np.ndarray, tuple[Union[str, list[str], np.ndarray], list[dict[str, Any]]]]:
     """The method to use from your project to render poses.
     Calls this script with required args using blender cli.
 
@@ -28,25 +71,833 @@ def render_pose(
         output_path (str, optional): Save dir path or file name. Defaults to "./output/pose".
         resolution_percentage (int, optional): Percentage of resolution (1080). Defaults to 100.
         samplings (int, optional): Samples during rendering. Defaults to 128.
+        instance_joints (bool, optional): Draw joints as instances of one sphere. Defaults to False.
+        mesh_limbs (bool, optional): Draw limbs as a single mesh of cylinders, cheaper than curves. Defaults to False.
+        lod (Optional[int], optional): Force a geometry level of detail, 0 is the finest. By default it is picked from
+            the projected joint size, so low resolution renders get coarser geometry. Defaults to None.
+        engine (str, optional): "CYCLES", or "BLENDER_EEVEE"/"BLENDER_WORKBENCH" for fast previews with the same
+            colors and framing. `samplings` is ignored by Workbench. Defaults to "CYCLES".
+        device (str, optional): Cycles device, "GPU" probes for CUDA devices, "CPU" skips the probe and uses
+            `threads` and `tile_size`. Defaults to "GPU".
+        threads (int, optional): CPU render threads, 0 uses all cores. Defaults to 0.
+        tile_size (Optional[Union[int, str]], optional): CPU render tile size in pixels, or "auto" to take the
+            threads and tile size of a calibration run, see `tune_cpu_render`. Defaults to None.
+        template_path (Optional[str], optional): Scene template .blend. Blender opens it and only adds the
+            skeletons; it is (re)built and saved here when missing or made with other settings. Defaults to None.
+        views (Optional[Union[list[tuple[float, float, float]], int]], optional): Camera views rendered from the one
+            built scene, as (azimuth, elevation, distance) in degrees and scene units around the pelvis, azimuth 0
+            facing the front and elevation 89, the largest allowed, looking down. An int renders a turntable of that
+            many views.
+            Defaults to None, the single default camera.
+        pixels_dtype (Optional[str], optional): "float32" or "uint8" to get the render as a (H, W, 4) RGBA array
+            instead of a PNG file. Blender writes it to a memory-mapped file in shared memory that is returned
+            without copying; float32 pixels are linear, uint8 pixels sRGB encoded without the view transform of
+            saved images. Not combined with `views`. Defaults to None.
+        cache_dir (Optional[str], optional): Directory of a render cache. When an image of the same inputs is
+            cached it is copied to the output without launching Blender, single view PNG renders only.
+            Defaults to None, no caching.
+        cache_max_mb (float, optional): Size limit of the cache, least recently used images are evicted.
+            Defaults to 1024.0.
+        job_id (Optional[str], optional): Id of the timing records. Defaults to None, a random id.
+        return_timings (bool, optional): Also return the per-stage timings. Defaults to False.
+        blender_path (str, optional): Blender exec path. Defaults to "blender".
+        gui (bool, optional): Run with gui, for experimentation and debugging. Defaults to False.
+
+    Returns:
+        Union[str, list[str], np.ndarray, tuple[Union[str, list[str], np.ndarray], list[dict[str, Any]]]]: Path of
+            the rendered image, `<output_path>0001.png`, with `views` the paths of all views,
+            `<output_path>_view<k>.png`, or with `pixels_dtype` the read-only pixel array.
+            With `return_timings`, also a list of `{"job_id", "stage", "start", "duration"}` records covering
+            Blender start-up, scene building and the render stages, plus a `"total"` record of the whole call.
+    """
+    if views is not None and pixels_dtype is not None:
+        raise ValueError("Pixels are returned for single view renders only.")
+
+    start = time.time()
+    job_id = job_id or uuid.uuid4().hex
+    image_path = f"{output_path}0001.png"
+    view_paths: Optional[list[str]] = None
+    render_flags = ["--render-frame", "1"]
+    view_args = []
+    if views is not None:
+        num_views = views if isinstance(views, int) else len(views)
+        view_paths = [f"{output_path}_view{k}.png" for k in range(num_views)]
+        # The script renders and saves every view itself
+        render_flags = []
+        if isinstance(views, int):
+            view_args = ["--turntable", str(views)]
+        else:
+            view_args = ["--views", *(str(float(value)) for view in views for value in view)]
+    arrays = {"pose": pose, "joint_links": joint_links, "gt_pose": gt_pose, "gt_joint_links": gt_joint_links}
+    options = _scene_options(instance_joints, mesh_limbs, lod, engine)
+
+    cache = None
+    if cache_dir is not None and views is None and pixels_dtype is None and not gui:
+        cache = RenderCache(cache_dir, cache_max_mb)
+        key = cache_key(
+            arrays,
+            dict(
+                options,
+                color=color,
+                gt_color=gt_color if gt_pose is not None else None,
+                resolution_percentage=resolution_percentage,
+                samplings=samplings,
+            ),
+        )
+        if cache.fetch(key, image_path):
+            timings = [{"job_id": job_id, "stage": "cache_fetch", "start": start, "duration": time.time() - start}]
+            return (image_path, timings) if return_timings else image_path
+
+    with tempfile.TemporaryDirectory(prefix="human_pose_", dir=PAYLOAD_ROOT) as payload_dir:
+        save_payload(payload_dir, **arrays)
+        timings_path = os.path.join(payload_dir, "timings.jsonl")
+        if pixels_dtype is not None:
+            # The script renders without writing an image file
+            render_flags = []
+            view_args = ["--pixels_path", os.path.join(payload_dir, "pixels.npy"), "--pixels_dtype", pixels_dtype]
+        script_args = [
+            "--payload",
+            payload_dir,
+            *view_args,
+            *_render_args(
+                color,
+                gt_color,
+                output_path,
+                resolution_percentage,
+                samplings,
+                job_id=job_id,
+                timings_path=timings_path,
+                **options,
+                **_cpu_options(device, threads, tile_size, pose, joint_links, resolution_percentage, blender_path),
+                **_template_options(template_path, resolution_percentage, samplings, engine),
+            ),
+        ]
+        _run_blender(script_args, blender_path, gui, render_flags=render_flags, template_path=template_path)
+        timings = _read_timings(timings_path)
+        if pixels_dtype is not None:
+            # The mapping stays valid once the payload dir is removed
+            pixels = np.load(os.path.join(payload_dir, "pixels.npy"), mmap_mode="r")
+
+    # An image left at the output path by an earlier run is not cached in place of this render
+    if cache is not None and os.path.exists(image_path) and os.path.getmtime(image_path) >= start:
+        cache.store(key, image_path)
+
+    result = pixels if pixels_dtype is not None else view_paths if view_paths is not None else image_path
+    timings.append({"job_id": job_id, "stage": "total", "start": start, "duration": time.time() - start})
+    return (result, timings) if return_timings else result
+
+
+def render_poses(
+    poses: list[list[list[float]]],
+    joint_links: list[list[int]],
+    color: tuple[float, float, float] = (0.1, 0.2, 0.6),
+    gt_poses: Optional[list[list[list[float]]]] = None,
+    gt_joint_links: Optional[list[list[int]]] = None,
+    gt_color: Optional[tuple[float, float, float]] = (0.6, 0.1, 0.2),
+    output_path: str = "./output/pose",
+    resolution_percentage: int = 100,
+    samplings: int = 128,
+    instance_joints: bool = False,
+    mesh_limbs: bool = False,
+    lod: Optional[int] = None,
+    engine: str = "CYCLES",
+    device: str = "GPU",
+    threads: int = 0,
+    tile_size: Optional[Union[int, str]] = None,
+    template_path: Optional[str] = None,
+    video_path: Optional[str] = None,
+    fps: int = 24,
+    ffmpeg_path: str = "ffmpeg",
+    blender_path: str = "blender",
+    gui: bool = False,
+) -> list[str]:
+    """Render many poses sharing the same joint links in a single Blender session.
+    The scene is built once, then only the joints and limbs are moved for each pose.
+
+    Args:
+        poses (list[list[list[float]]]): List of poses, each a list of x,y,z of joints.
+        joint_links (list[list[int]]): List of connections between joints.
+        color (tuple[float, float, float], optional): RGB (0-1 scale) color for skeletons. Defaults to (0.1, 0.2, 0.6).
+        gt_poses (Optional[list[list[list[float]]]], optional): Poses for comparison, one per pose. Defaults to None.
+        gt_joint_links (Optional[list[list[int]]]): List of connections between joints for GT poses.
+        gt_color (Optional[tuple[float, float, float]], optional): RGB (0-1 scale) for GT skeletons.
+            Defaults to (0.6, 0.1, 0.2).
+        output_path (str, optional): Prefix of the numbered output images. Defaults to "./output/pose".
+        resolution_percentage (int, optional): Percentage of resolution (1080). Defaults to 100.
+        samplings (int, optional): Samples during rendering. Defaults to 128.
+        instance_joints, mesh_limbs, lod, engine, device, threads, tile_size, template_path: Geometry, engine, CPU
+            and scene template options, see `render_pose`.
+        video_path (Optional[str], optional): Stream the frames into this video instead of writing images, encoded
+            by ffmpeg while rendering, or written as an uncompressed `.y4m` next to it when ffmpeg is not installed.
+            Transparent pixels are shown white and no view transform is applied, see `human_pose.VideoSink`.
+            Defaults to None.
+        fps (int, optional): Frame rate of the video. Defaults to 24.
+        ffmpeg_path (str, optional): ffmpeg exec path. Defaults to "ffmpeg".
+        blender_path (str, optional): Blender exec path. Defaults to "blender".
+        gui (bool, optional): Run with gui, for experimentation and debugging. Defaults to False.
+
+    Returns:
+        list[str]: Paths of the rendered images, `<output_path>0001.png` onwards, or with `video_path` the video.
+    """
+    if gt_poses is not None and len(gt_poses) != len(poses):
+        raise ValueError("One GT pose is required per pose.")
+
+    with tempfile.TemporaryDirectory(prefix="human_pose_", dir=PAYLOAD_ROOT) as payload_dir:
+        save_payload(payload_dir, pose=poses, joint_links=joint_links, gt_pose=gt_poses, gt_joint_links=gt_joint_links)
+        video_args, video_path = _video_args(video_path, ffmpeg_path)
+        script_args = [
+            "--batch",
+            "--fps",
+            str(fps),
+            *video_args,
+            "--payload",
+            payload_dir,
+            *_render_args(
+                color,
+                gt_color,
+                output_path,
+                resolution_percentage,
+                samplings,
+                **_scene_options(instance_joints, mesh_limbs, lod, engine),
+                **_cpu_options(device, threads, tile_size, poses[0], joint_links, resolution_percentage, blender_path),
+                **_template_options(template_path, resolution_percentage, samplings, engine),
+            ),
+        ]
+        _run_blender(script_args, blender_path, gui, template_path=template_path)
+
+    if video_path is not None:
+        return [video_path]
+    return [f"{output_path}{idx + 1:04d}.png" for idx in range(len(poses))]
+
+
+def render_pose_sequence(
+    poses: Any,
+    joint_links: list[list[int]],
+    color: tuple[float, float, float] = (0.1, 0.2, 0.6),
+    gt_poses: Optional[Any] = None,
+    gt_joint_links: Optional[list[list[int]]] = None,
+    gt_color: Optional[tuple[float, float, float]] = (0.6, 0.1, 0.2),
+    output_path: str = "./output/frame_",
+    resolution_percentage: int = 100,
+    samplings: int = 128,
+    fps: int = 24,
+    standardize: str = "sequence",
+    keyframe_tolerance: Optional[float] = None,
+    instance_joints: bool = False,
+    mesh_limbs: bool = False,
+    lod: Optional[int] = None,
+    engine: str = "CYCLES",
+    device: str = "GPU",
+    threads: int = 0,
+    tile_size: Optional[Union[int, str]] = None,
+    template_path: Optional[str] = None,
+    video_path: Optional[str] = None,
+    ffmpeg_path: str = "ffmpeg",
+    blender_path: str = "blender",
+    gui: bool = False,
+) -> list[str]:
+    """Render a motion sequence as animation frames with a single Blender launch.
+    The skeletons are built once and their joints and limbs are keyframed for every frame.
+
+    Args:
+        poses (Any): (T, J, 3) array-like of x,y,z of joints for every frame.
+        joint_links (list[list[int]]): List of connections between joints.
+        color (tuple[float, float, float], optional): RGB (0-1 scale) color for skeleton. Defaults to (0.1, 0.2, 0.6).
+        gt_poses (Optional[Any], optional): (T, J, 3) sequence for comparison. Defaults to None.
+        gt_joint_links (Optional[list[list[int]]]): List of connections between joints for GT poses.
+        gt_color (Optional[tuple[float, float, float]], optional): RGB (0-1 scale) for GT skeleton.
+            Defaults to (0.6, 0.1, 0.2).
+        output_path (str, optional): Prefix of the numbered frames. Defaults to "./output/frame_".
+        resolution_percentage (int, optional): Percentage of resolution (1080). Defaults to 100.
+        samplings (int, optional): Samples during rendering. Defaults to 128.
+        fps (int, optional): Frame rate stored in the scene. Defaults to 24.
+        standardize (str, optional): Scale and floor the poses once for the whole "sequence", so the framing does
+            not jitter between frames, or per "pose" like single renders. Defaults to "sequence".
+        keyframe_tolerance (Optional[float], optional): Upload only the keyframes needed to reproduce every joint
+            within this distance, in the units of the poses, and let Blender interpolate the frames between them
+            linearly. Every frame is still rendered. Exact with "sequence" standardization, whose framing is kept.
+            Defaults to None.
+        instance_joints, mesh_limbs, lod, engine, device, threads, tile_size, template_path: Geometry, engine, CPU
+            and scene template options, see `render_pose`.
+        video_path (Optional[str], optional): Stream the frames into this video instead of writing images, encoded
+            by ffmpeg while rendering, or written as an uncompressed `.y4m` next to it when ffmpeg is not installed.
+            Transparent pixels are shown white and no view transform is applied, see `human_pose.VideoSink`.
+            Defaults to None.
+        ffmpeg_path (str, optional): ffmpeg exec path. Defaults to "ffmpeg".
+        blender_path (str, optional): Blender exec path. Defaults to "blender".
+        gui (bool, optional): Run with gui, for experimentation and debugging. Defaults to False.
+
+    Returns:
+        list[str]: Paths of the rendered frames, `<output_path>0001.png` onwards, or with `video_path` the video.
+    """
+    num_frames = len(poses)
+    if gt_poses is not None and len(gt_poses) != num_frames:
+        raise ValueError("GT sequence must have as many frames as the sequence.")
+
+    frames = None
+    if keyframe_tolerance is not None:
+        keep = _sequence_keyframes(poses, gt_poses, keyframe_tolerance, standardize)
+        poses = np.asarray(poses)[keep]
+        gt_poses = np.asarray(gt_poses)[keep] if gt_poses is not None else None
+        frames = keep + 1
+
+    with tempfile.TemporaryDirectory(prefix="human_pose_", dir=PAYLOAD_ROOT) as payload_dir:
+        save_payload(
+            payload_dir,
+            pose=poses,
+            joint_links=joint_links,
+            gt_pose=gt_poses,
+            gt_joint_links=gt_joint_links,
+            frames=frames,
+        )
+        video_args, video_path = _video_args(video_path, ffmpeg_path)
+        script_args = [
+            "--animation",
+            "--fps",
+            str(fps),
+            "--standardize",
+            standardize,
+            *video_args,
+            "--payload",
+            payload_dir,
+            *_render_args(
+                color,
+                gt_color,
+                output_path,
+                resolution_percentage,
+                samplings,
+                **_scene_options(instance_joints, mesh_limbs, lod, engine),
+                **_cpu_options(device, threads, tile_size, poses[0], joint_links, resolution_percentage, blender_path),
+                **_template_options(template_path, resolution_percentage, samplings, engine),
+            ),
+        ]
+        # Video frames are rendered by the script itself
+        render_flags = [] if video_path is not None else ["--render-anim"]
+        _run_blender(script_args, blender_path, gui, render_flags=render_flags, template_path=template_path)
+
+    if video_path is not None:
+        return [video_path]
+    return [f"{output_path}{frame:04d}.png" for frame in range(1, num_frames + 1)]
+
+
+def render_pose_grid(
+    poses: list[list[list[float]]],
+    joint_links: list[list[int]],
+    rows: int,
+    cols: int,
+    color: tuple[float, float, float] = (0.1, 0.2, 0.6),
+    labels: Optional[list[str]] = None,
+    gt_poses: Optional[list[list[list[float]]]] = None,
+    gt_joint_links: Optional[list[list[int]]] = None,
+    gt_color: Optional[tuple[float, float, float]] = (0.6, 0.1, 0.2),
+    output_path: str = "./output/grid",
+    resolution_percentage: int = 100,
+    samplings: int = 128,
+    instance_joints: bool = False,
+    mesh_limbs: bool = False,
+    lod: Optional[int] = None,
+    engine: str = "CYCLES",
+    device: str = "GPU",
+    threads: int = 0,
+    tile_size: Optional[Union[int, str]] = None,
+    blender_path: str = "blender",
+    gui: bool = False,
+) -> str:
+    """Render many poses as a contact sheet, a single image of a `rows` x `cols` grid with one skeleton per cell.
+    All skeletons are built in one scene and rendered once, the camera is placed so that every cell fits.
+
+    Args:
+        poses (list[list[list[float]]]): List of at most `rows * cols` poses, filling the grid row by row.
+        joint_links (list[list[int]]): List of connections between joints.
+        rows (int): Number of grid rows.
+        cols (int): Number of grid columns.
+        color (tuple[float, float, float], optional): RGB (0-1 scale) color for skeletons. Defaults to (0.1, 0.2, 0.6).
+        labels (Optional[list[str]], optional): Text written below the skeleton of each cell. Defaults to None.
+        gt_poses (Optional[list[list[list[float]]]], optional): Poses for comparison, drawn in the same cells.
+            Defaults to None.
+        gt_joint_links (Optional[list[list[int]]]): List of connections between joints for GT poses.
+        gt_color (Optional[tuple[float, float, float]], optional): RGB (0-1 scale) for GT skeletons.
+            Defaults to (0.6, 0.1, 0.2).
+        output_path (str, optional): Prefix of the output image. Defaults to "./output/grid".
+        resolution_percentage (int, optional): Percentage of resolution (1080 on the longest side). Defaults to 100.
+        samplings (int, optional): Samples during rendering. Defaults to 128.
+        instance_joints, mesh_limbs, lod, engine, device, threads, tile_size: Geometry, engine and CPU options,
+            see `render_pose`. The level of detail is picked from the cell size, so large grids get coarser geometry.
         blender_path (str, optional): Blender exec path. Defaults to "blender".
         gui (bool, optional): Run with gui, for experimentation and debugging. Defaults to False.
+
+    Returns:
+        str: Path of the rendered image, `<output_path>0001.png`.
+    """
+    if len(poses) == 0:
+        raise ValueError("At least one pose is required for a grid.")
+    if len(poses) > rows * cols:
+        raise ValueError(f"{len(poses)} poses do not fit a {rows}x{cols} grid.")
+    if gt_poses is not None and len(gt_poses) != len(poses):
+        raise ValueError("One GT pose is required per pose.")
+
+    with tempfile.TemporaryDirectory(prefix="human_pose_", dir=PAYLOAD_ROOT) as payload_dir:
+        save_payload(payload_dir, pose=poses, joint_links=joint_links, gt_pose=gt_poses, gt_joint_links=gt_joint_links)
+        script_args = [
+            "--grid",
+            str(rows),
+            str(cols),
+            "--payload",
+            payload_dir,
+            *_render_args(
+                color,
+                gt_color,
+                output_path,
+                resolution_percentage,
+                samplings,
+                labels=json.dumps(list(map(str, labels))) if labels else None,
+                **_scene_options(instance_joints, mesh_limbs, lod, engine),
+                **_cpu_options(device, threads, tile_size, poses[0], joint_links, resolution_percentage, blender_path),
+            ),
+        ]
+        _run_blender(script_args, blender_path, gui, render_flags=["--render-frame", "1"])
+
+    return f"{output_path}0001.png"
+
+
+def tune_cpu_render(
+    pose: list[list[float]],
+    joint_links: list[list[int]],
+    resolution_percentage: int = 100,
+    thread_counts: Optional[list[int]] = None,
+    tile_sizes: tuple[int, ...] = (16, 32, 64, 128, 256),
+    calibration_samples: int = 16,
+    cache_path: str = CPU_TUNING_PATH,
+    blender_path: str = "blender",
+) -> dict[str, int]:
+    """Pick the fastest CPU thread count and tile size for a resolution from one short calibration run in Blender.
+
+    Results are cached on disk per machine, Blender path, resolution and candidates, so the calibration only runs
+    the first time.
+
+    Args:
+        pose (list[list[float]]): A representative pose to render.
+        joint_links (list[list[int]]): List of connections between joints.
+        resolution_percentage (int, optional): Percentage of resolution (1080). Defaults to 100.
+        thread_counts (Optional[list[int]], optional): Thread counts to try. Defaults to None, all cores and half
+            of them, since hyper-threads do not always pay off.
+        tile_sizes (tuple[int, ...], optional): Tile sizes to try. Defaults to (16, 32, 64, 128, 256).
+        calibration_samples (int, optional): Samples of each calibration render. Defaults to 16.
+        cache_path (str, optional): JSON file of the tuning results. Defaults to `CPU_TUNING_PATH`.
+        blender_path (str, optional): Blender exec path. Defaults to "blender".
+
+    Returns:
+        dict[str, int]: `{"threads", "tile_size"}` of the fastest calibration render.
+    """
+    num_cores = os.cpu_count() or 1
+    thread_counts = thread_counts or sorted({num_cores, max(1, num_cores // 2)}, reverse=True)
+    key = json.dumps([platform.node(), num_cores, blender_path, resolution_percentage, thread_counts, list(tile_sizes)])
+
+    try:
+        with open(cache_path) as cache_file:
+            tuning = json.load(cache_file)
+    except (OSError, ValueError):
+        tuning = {}
+    if key in tuning:
+        return tuning[key]
+
+    with tempfile.TemporaryDirectory(prefix="human_pose_", dir=PAYLOAD_ROOT) as payload_dir:
+        save_payload(payload_dir, pose=pose, joint_links=joint_links)
+        results_path = os.path.join(payload_dir, "calibration.json")
+        script_args = [
+            "--calibrate",
+            results_path,
+            "--thread_counts",
+            *map(str, thread_counts),
+            "--tile_sizes",
+            *map(str, tile_sizes),
+            "--payload",
+            payload_dir,
+            *_render_args((0.1, 0.2, 0.6), None, "", resolution_percentage, calibration_samples),
+        ]
+        _run_blender(script_args, blender_path, gui=False)
+        with open(results_path) as results_file:
+            results = json.load(results_file)
+
+    fastest = min(results, key=lambda result: result["seconds"])
+    tuning[key] = {"threads": fastest["threads"], "tile_size": fastest["tile_size"]}
+
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    temp_path = cache_path + f".{os.getpid()}.tmp"
+    with open(temp_path, "w") as cache_file:
+        json.dump(tuning, cache_file)
+    os.replace(temp_path, cache_path)
+    return tuning[key]
+
+
+def _scene_options(instance_joints: bool, mesh_limbs: bool, lod: Optional[int], engine: str) -> dict[str, Any]:
+    """Script args of the skeleton geometry and render engine, shared by all render modes, see `render_pose`."""
+    if lod is not None and not 0 <= lod < NUM_GEOMETRY_LODS:
+        raise ValueError(f"Unknown level of detail {lod}, expected 0 to {NUM_GEOMETRY_LODS - 1} or None.")
+    return {"instance_joints": instance_joints, "mesh_limbs": mesh_limbs, "lod": lod, "engine": engine}
+
+
+def _cpu_options(
+    device: str,
+    threads: int,
+    tile_size: Optional[Union[int, str]],
+    pose: Any,
+    joint_links: Any,
+    resolution_percentage: int,
+    blender_path: str,
+) -> dict[str, Any]:
+    """Script args of the render device, a "auto" tile size is resolved with `tune_cpu_render`."""
+    if device != "CPU":
+        return {"device": device}
+    if tile_size == "auto":
+        thread_counts = [threads] if threads > 0 else None
+        tuned = tune_cpu_render(pose, joint_links, resolution_percentage, thread_counts, blender_path=blender_path)
+        threads, tile_size = tuned["threads"], tuned["tile_size"]
+    return {"device": device, "threads": threads, "tile_size": tile_size}
+
+
+def save_payload(payload_dir: str, **arrays: Any) -> None:
+    """Write pose arrays as `.npy` files that `human_pose.load_payload` memory-maps, `None` values are skipped.
+
+    Coordinates are stored as float32 and joint links as int32, whatever the input array-like type is.
+    """
+    for name, array in arrays.items():
+        if array is None:
+            continue
+        dtype = np.int32 if name.endswith("joint_links") or name == "frames" else np.float32
+        np.save(os.path.join(payload_dir, name + ".npy"), np.ascontiguousarray(array, dtype=dtype))
+
+
+def _sequence_keyframes(poses: Any, gt_poses: Optional[Any], tolerance: float, standardize: str) -> np.ndarray:
+    """Frames of a sequence and its GT sequence to upload as keyframes, see `motion_resampling.reduce_keyframes`.
+
+    The frames holding the largest coordinate and the lowest joint are kept as well, so that "sequence"
+    standardization in Blender finds the same scale and floor as it would for the full sequence.
     """
-    script_path = "human_pose.py"
-    cmd_parts = [
-        blender_path,
-        "--background" if not gui else "",
-        f"--python {script_path}",
-        "--render-frame 1",
-        "--",  # Blender ignore the args following this.
-        f"--pose '{(list(pose))}'",
-        f"--joint_links '{(list(joint_links))}'",
-        f"--color {color[0]} {color[1]} {color[2]}" if color else "",
-        f"--gt_pose '{(list(gt_pose))}'" if gt_pose is not None else "",
-        f"--gt_joint_links '{(list(gt_joint_links))}'" if gt_joint_links is not None else "",
-        f"--gt_color {gt_color[0]} {gt_color[1]} {gt_color[2]}" if gt_color else "",
-        f"--output_path {output_path}",
-        f"--resolution_percentage {resolution_percentage}",
-        f"--samplings {samplings}",
+    poses = np.asarray(poses, dtype=np.float32)
+    sequences = [poses] if gt_poses is None else [poses, np.asarray(gt_poses, dtype=np.float32)]
+    keep = reduce_keyframes(np.concatenate(sequences, axis=1), tolerance)
+    if standardize == "sequence":
+        extremes = []
+        for sequence in sequences:
+            swapped = swap_axes(sequence)
+            extremes.append(np.unravel_index(swapped.argmax(), swapped.shape)[0])
+            extremes.append(np.unravel_index(swapped[..., 2].argmin(), swapped.shape[:2])[0])
+        keep = np.union1d(keep, extremes)
+    return keep
+
+
+def template_stamp(resolution_percentage: int, samplings: int, engine: str) -> str:
+    """Version of the static scene, it changes with the settings baked into it and with the scene code."""
+    settings = json.dumps([resolution_percentage, samplings, engine])
+    return hashlib.sha256((source_version() + settings).encode()).hexdigest()[:16]
+
+
+def _template_options(
+    template_path: Optional[str], resolution_percentage: int, samplings: int, engine: str
+) -> dict[str, str]:
+    """Script args to reuse or (re)build the template at `template_path`, none without a template."""
+    if template_path is None:
+        return {}
+    return {
+        "template_path": os.path.abspath(template_path),
+        "template_stamp": template_stamp(resolution_percentage, samplings, engine),
+    }
+
+
+def _video_args(video_path: Optional[str], ffmpeg_path: str) -> tuple[list[str], Optional[str]]:
+    """Script args to stream frames into `video_path`, and the path actually written, a `.y4m` without ffmpeg."""
+    if video_path is None:
+        return [], None
+    ffmpeg = shutil.which(ffmpeg_path)
+    if ffmpeg is None:
+        video_path = os.path.splitext(video_path)[0] + ".y4m"
+        return ["--video_path", os.path.abspath(video_path)], video_path
+    return ["--video_path", os.path.abspath(video_path), "--ffmpeg_path", ffmpeg], video_path
+
+
+def _read_timings(timings_path: str) -> list[dict[str, Any]]:
+    """Stage timing records written by `human_pose.StageTimer`."""
+    if not os.path.exists(timings_path):
+        return []
+    with open(timings_path) as timings_file:
+        return [json.loads(line) for line in timings_file if line.strip()]
+
+
+def _render_args(
+    color: Optional[tuple[float, float, float]],
+    gt_color: Optional[tuple[float, float, float]],
+    output_path: str,
+    resolution_percentage: int,
+    samplings: int,
+    **options: Any,
+) -> list[str]:
+    """Script args shared by all render modes, `options` become `--name value`, or `--name` for a True flag."""
+    args = []
+    if color:
+        args += ["--color", *map(str, color)]
+    if gt_color:
+        args += ["--gt_color", *map(str, gt_color)]
+    args += [
+        "--output_path",
+        output_path,
+        "--resolution_percentage",
+        str(resolution_percentage),
+        "--samplings",
+        str(samplings),
     ]
-    command = " ".join(cmd_parts)
-    _ = subprocess.call(command, shell=True)
+    for name, value in options.items():
+        if value is None or value is False:
+            continue
+        args += [f"--{name}"] if value is True else [f"--{name}", str(value)]
+    return args
+
+
+def _run_blender(
+    script_args: list[str],
+    blender_path: str,
+    gui: bool,
+    render_flags: Optional[list[str]] = None,
+    template_path: Optional[str] = None,
+) -> None:
+    """Run `human_pose.py` in Blender with the given script args, `render_flags` are passed to Blender after it.
+    The scene template at `template_path` is opened first when it exists. Errors in the script fail the call."""
+    command = [blender_path]
+    if template_path is not None and os.path.exists(template_path):
+        command.append(template_path)
+    if not gui:
+        command.append("--background")
+    command += ["--python-exit-code", "1", "--python", SCRIPT_PATH]
+    command += render_flags or []
+    command.append("--")  # Blender ignore the args following this.
+    command += ["--spawn_time", repr(time.time())]
+    command += script_args
+    return_code = subprocess.call(command)
+    if return_code != 0:
+        raise RuntimeError(f"Blender exited with code {return_code}.")
+
+
+class _Worker:
+    """A Blender process running `human_pose.run_worker` and the host ends of its pipes."""
+
+    def __init__(self, process: subprocess.Popen, jobs: Connection, results: Connection) -> None:
+        self.process = process
+        self.jobs = jobs
+        self.results = results
+        self.num_jobs = 0
+
+    def close(self) -> None:
+        try:
+            self.jobs.send(None)
+        except OSError:
+            pass
+        self.jobs.close()
+        self.results.close()
+        self.process.wait()
+
+
+class BlenderWorkerPool:
+    def __init__(
+        self,
+        num_workers: int = 1,
+        max_jobs_per_worker: int = 1000,
+        max_rss_mb: Optional[float] = None,
+        blender_path: str = "blender",
+        quiet: bool = True,
+        device: str = "GPU",
+        tile_size: Optional[Union[int, str]] = None,
+    ) -> None:
+        """Pool of long-lived background Blender processes that render poses sent over pipes.
+
+        Blender start-up, addon loading and Cycles kernel setup are paid once per worker instead of once per pose.
+        Workers are recycled after `max_jobs_per_worker` jobs or once their RSS passes `max_rss_mb`.
+        Pipes are handed over with `pass_fds`, so the pool is POSIX only.
+        On the "CPU" `device` the cores are split between the workers so that they do not oversubscribe the machine.
+
+        Args:
+            num_workers (int, optional): Number of Blender processes. Defaults to 1.
+            max_jobs_per_worker (int, optional): Jobs after which a worker is restarted. Defaults to 1000.
+            max_rss_mb (Optional[float], optional): RSS in MiB after which a worker is restarted. Defaults to None.
+            blender_path (str, optional): Blender exec path. Defaults to "blender".
+            quiet (bool, optional): Discard the stdout of the Blender processes. Defaults to True.
+            device (str, optional): Cycles device, see `render_pose`. Defaults to "GPU".
+            tile_size (Optional[Union[int, str]], optional): CPU render tile size in pixels, or "auto" to tune it
+                for the threads of a worker with the first submitted pose. Defaults to None.
+        """
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_rss_mb = max_rss_mb
+        self.blender_path = blender_path
+        self.quiet = quiet
+        self.device = device
+        self.threads = max(1, (os.cpu_count() or 1) // num_workers) if device == "CPU" else 0
+        self.tile_size = tile_size
+
+        # None is queued once a replacement worker fails to start, waking up the jobs waiting for a worker
+        self._idle_workers: queue.Queue[Optional[_Worker]] = queue.Queue()
+        self._all_workers: set[_Worker] = set()
+        self._lock = threading.Lock()
+        self._tuning_lock = threading.Lock()
+        self._broken: Optional[BaseException] = None
+        for _ in range(num_workers):
+            self._idle_workers.put(self._spawn())
+        self._executor = ThreadPoolExecutor(max_workers=num_workers)
+
+    def _spawn(self) -> _Worker:
+        host_read, worker_write = os.pipe()
+        worker_read, host_write = os.pipe()
+        command = [
+            self.blender_path,
+            "--background",
+            "--python",
+            SCRIPT_PATH,
+            "--",  # Blender ignore the args following this.
+            "--worker_fds",
+            str(worker_read),
+            str(worker_write),
+        ]
+        try:
+            process = subprocess.Popen(
+                command,
+                pass_fds=(worker_read, worker_write),
+                stdout=subprocess.DEVNULL if self.quiet else None,
+            )
+        except OSError:
+            for fd in (host_read, host_write):
+                os.close(fd)
+            raise
+        finally:
+            os.close(worker_read)
+            os.close(worker_write)
+
+        worker = _Worker(process, Connection(host_write, readable=False), Connection(host_read, writable=False))
+        with self._lock:
+            self._all_workers.add(worker)
+        return worker
+
+    def _retire(self, worker: _Worker) -> None:
+        with self._lock:
+            self._all_workers.discard(worker)
+        worker.close()
+
+    def _replace(self, worker: _Worker) -> None:
+        """Retire `worker` and queue a new one. When the new one fails to start the pool is marked broken, so
+        that queued and later jobs fail instead of waiting for a worker that never comes back."""
+        self._retire(worker)
+        try:
+            replacement = self._spawn()
+        except Exception as error:
+            self._broken = error
+            self._idle_workers.put(None)
+            raise
+        self._idle_workers.put(replacement)
+
+    def _run(
+        self, job: dict[str, Any], return_timings: bool
+    ) -> Union[str, np.ndarray, tuple[Union[str, np.ndarray], list[dict[str, Any]]]]:
+        worker = self._idle_workers.get()
+        if worker is None:
+            # Pass the wake-up on to the next waiting job
+            self._idle_workers.put(None)
+            raise RuntimeError("Blender worker pool is broken, a worker failed to start.") from self._broken
+        try:
+            worker.jobs.send(job)
+            result = worker.results.recv()
+            if result.get("pixels_path"):
+                # Mapped before the payload dir is removed
+                result["pixels"] = np.load(result["pixels_path"], mmap_mode="r")
+        except (EOFError, OSError):
+            # The worker died mid-job, replace it so the pool keeps its size
+            self._replace(worker)
+            raise RuntimeError("Blender worker exited while rendering.")
+        finally:
+            shutil.rmtree(job["payload"], ignore_errors=True)
+
+        worker.num_jobs += 1
+        rss_exceeded = self.max_rss_mb is not None and result["rss"] > self.max_rss_mb * 2**20
+        if worker.num_jobs >= self.max_jobs_per_worker or rss_exceeded:
+            self._replace(worker)
+        else:
+            self._idle_workers.put(worker)
+
+        if not result["ok"]:
+            raise RuntimeError(f"Blender worker failed to render:\n{result['error']}")
+        output = result["pixels"] if "pixels" in result else result["image_path"]
+        if return_timings:
+            return output, result["timings"]
+        return output
+
+    def submit(
+        self,
+        pose: list[list[float]],
+        joint_links: list[list[int]],
+        color: tuple[float, float, float] = (0.1, 0.2, 0.6),
+        gt_pose: Optional[list[list[float]]] = None,
+        gt_joint_links: Optional[list[list[int]]] = None,
+        gt_color: Optional[tuple[float, float, float]] = (0.6, 0.1, 0.2),
+        output_path: str = "./output/pose",
+        resolution_percentage: int = 100,
+        samplings: int = 128,
+        instance_joints: bool = False,
+        mesh_limbs: bool = False,
+        lod: Optional[int] = None,
+        engine: str = "CYCLES",
+        pixels_dtype: Optional[str] = None,
+        job_id: Optional[str] = None,
+        return_timings: bool = False,
+    ) -> Future:
+        """Queue a pose for rendering, arguments are the same as `render_pose`.
+        Workers keep the static scene of their previous job when the settings baked into it match.
+
+        Returns:
+            Future: Resolves to the path of the written image, or the pixel array with `pixels_dtype`.
+        """
+        if self._broken is not None:
+            raise RuntimeError("Blender worker pool is broken, a worker failed to start.") from self._broken
+        # Concurrent first submits tune once, the others wait for its tile size
+        with self._tuning_lock:
+            if self.device == "CPU" and self.tile_size == "auto":
+                tuned = tune_cpu_render(
+                    pose, joint_links, resolution_percentage, [self.threads], blender_path=self.blender_path
+                )
+                self.tile_size = tuned["tile_size"]
+            tile_size = self.tile_size
+
+        payload_dir = tempfile.mkdtemp(prefix="human_pose_", dir=PAYLOAD_ROOT)
+        save_payload(payload_dir, pose=pose, joint_links=joint_links, gt_pose=gt_pose, gt_joint_links=gt_joint_links)
+        job = {
+            "payload": payload_dir,
+            "color": tuple(color),
+            "gt_color": tuple(gt_color) if gt_color else None,
+            "output_path": os.path.abspath(output_path),
+            "resolution_percentage": resolution_percentage,
+            "samplings": samplings,
+            **_scene_options(instance_joints, mesh_limbs, lod, engine),
+            "template_stamp": template_stamp(resolution_percentage, samplings, engine),
+            "device": self.device,
+            "threads": self.threads,
+            "tile_size": tile_size,
+            "pixels_dtype": pixels_dtype,
+            "job_id": job_id or uuid.uuid4().hex,
+        }
+        return self._executor.submit(self._run, job, return_timings)
+
+    def render_pose(
+        self, *args, **kwargs
+    ) -> Union[str, np.ndarray, tuple[Union[str, np.ndarray], list[dict[str, Any]]]]:
+        """Blocking version of `submit`, returns the path of the written image or the pixel array."""
+        return self.submit(*args, **kwargs).result()
+
+    def close(self) -> None:
+        """Wait for queued jobs and stop all workers."""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            workers = list(self._all_workers)
+            self._all_workers.clear()
+        for worker in workers:
+            worker.close()
+
+    def __enter__(self) -> "BlenderWorkerPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
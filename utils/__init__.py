@@ -2,6 +2,7 @@ from utils.utils import *
 from utils.armature import *
 from utils.camera import *
 from utils.composition import *
+from utils.data import *
 from utils.image import *
 from utils.lighting import *
 from utils.material import *
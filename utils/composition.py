@@ -208,3 +208,23 @@ def build_scene_composition(scene: bpy.types.Scene,
     scene.node_tree.links.new(glare_node.outputs['Image'], composite_node.inputs['Image'])
 
     arrange_nodes(scene.node_tree)
+
+
+def build_viewer_composition(scene: bpy.types.Scene) -> None:
+    '''
+    Render layer to the composite output and to the viewer node, whose image pixels can be read after
+    rendering in background mode, unlike the pixels of the render result.
+    '''
+    scene.use_nodes = True
+    scene.render.use_compositing = True
+    clean_nodes(scene.node_tree.nodes)
+
+    render_layer_node = scene.node_tree.nodes.new(type="CompositorNodeRLayers")
+    composite_node = scene.node_tree.nodes.new(type="CompositorNodeComposite")
+    viewer_node = scene.node_tree.nodes.new(type="CompositorNodeViewer")
+    viewer_node.use_alpha = True
+
+    scene.node_tree.links.new(render_layer_node.outputs['Image'], composite_node.inputs['Image'])
+    scene.node_tree.links.new(render_layer_node.outputs['Image'], viewer_node.inputs['Image'])
+
+    arrange_nodes(scene.node_tree)
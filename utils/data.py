@@ -0,0 +1,170 @@
+import bpy
+import bmesh
+from mathutils import Matrix
+from typing import Callable, Iterable, Optional, Tuple
+from utils.modifier import add_subdivision_surface_modifier
+
+################################################################################
+# Operator-free counterparts of create_plane, create_smooth_sphere, create_camera etc.
+#
+# bpy.ops calls depend on the context and update the view layer on every call. These functions build the same
+# objects from bpy.data and bmesh instead. They link the new object to the active collection like the operators do,
+# or not at all with link=False, so that many objects can be linked at once with link_objects.
+################################################################################
+
+
+def link_objects(objects: Iterable[bpy.types.Object], collection: Optional[bpy.types.Collection] = None) -> None:
+    '''
+    Link objects to a collection, the active collection (where operators add objects) by default.
+    '''
+    if collection is None:
+        collection = bpy.context.collection
+    for obj in objects:
+        collection.objects.link(obj)
+
+
+def _create_object(name: str,
+                   data: Optional[bpy.types.ID],
+                   location: Tuple[float, float, float],
+                   rotation: Tuple[float, float, float],
+                   link: bool) -> bpy.types.Object:
+    new_object: bpy.types.Object = bpy.data.objects.new(name, data)
+    new_object.location = location
+    new_object.rotation_euler = rotation
+    if link:
+        link_objects([new_object])
+
+    return new_object
+
+
+def _create_bmesh_mesh(name: str, build: Callable[[bmesh.types.BMesh], None], use_smooth: bool) -> bpy.types.Mesh:
+    bm = bmesh.new()
+    build(bm)
+    new_mesh: bpy.types.Mesh = bpy.data.meshes.new(name)
+    bm.to_mesh(new_mesh)
+    bm.free()
+
+    if use_smooth:
+        new_mesh.polygons.foreach_set("use_smooth", [True] * len(new_mesh.polygons))
+    new_mesh.update()
+
+    return new_mesh
+
+
+def create_data_plane(location: Tuple[float, float, float] = (0.0, 0.0, 0.0),
+                      rotation: Tuple[float, float, float] = (0.0, 0.0, 0.0),
+                      size: float = 2.0,
+                      name: Optional[str] = None,
+                      link: bool = True) -> bpy.types.Object:
+    '''
+    Same as create_plane. https://docs.blender.org/api/current/bmesh.ops.html#bmesh.ops.create_grid
+    '''
+    name = "Plane" if name is None else name
+    mesh = _create_bmesh_mesh(
+        name, lambda bm: bmesh.ops.create_grid(bm, x_segments=1, y_segments=1, size=size / 2.0, calc_uvs=True),
+        use_smooth=False)
+
+    return _create_object(name, mesh, location, rotation, link)
+
+
+def create_data_smooth_sphere(location: Tuple[float, float, float] = (0.0, 0.0, 0.0),
+                              radius: float = 1.0,
+                              subdivision_level: int = 1,
+                              name: Optional[str] = None,
+                              segments: int = 32,
+                              ring_count: int = 16,
+                              link: bool = True) -> bpy.types.Object:
+    '''
+    Same as create_smooth_sphere. https://docs.blender.org/api/current/bmesh.ops.html#bmesh.ops.create_uvsphere
+    '''
+
+    def build(bm: bmesh.types.BMesh) -> None:
+        # The radius argument was called diameter before 3.0, while meaning the radius
+        size = {"radius": radius} if bpy.app.version >= (3, 0, 0) else {"diameter": radius}
+        bmesh.ops.create_uvsphere(bm, u_segments=segments, v_segments=ring_count, calc_uvs=True, **size)
+
+    name = "Sphere" if name is None else name
+    mesh = _create_bmesh_mesh(name, build, use_smooth=True)
+    current_object = _create_object(name, mesh, location, (0.0, 0.0, 0.0), link)
+
+    if subdivision_level > 0:
+        add_subdivision_surface_modifier(current_object, subdivision_level)
+
+    return current_object
+
+
+def create_data_smooth_monkey(location: Tuple[float, float, float] = (0.0, 0.0, 0.0),
+                              rotation: Tuple[float, float, float] = (0.0, 0.0, 0.0),
+                              subdivision_level: int = 2,
+                              name: Optional[str] = None,
+                              link: bool = True) -> bpy.types.Object:
+    '''
+    Same as create_smooth_monkey. https://docs.blender.org/api/current/bmesh.ops.html#bmesh.ops.create_monkey
+    '''
+    name = "Suzanne" if name is None else name
+    mesh = _create_bmesh_mesh(name,
+                              lambda bm: bmesh.ops.create_monkey(bm, matrix=Matrix.Identity(4), calc_uvs=True),
+                              use_smooth=True)
+    current_object = _create_object(name, mesh, location, rotation, link)
+
+    add_subdivision_surface_modifier(current_object, subdivision_level)
+
+    return current_object
+
+
+def create_data_camera(location: Tuple[float, float, float],
+                       name: str = "Camera",
+                       link: bool = True) -> bpy.types.Object:
+    '''
+    Same as create_camera.
+    '''
+    camera = bpy.data.cameras.new(name)
+
+    return _create_object(name, camera, location, (0.0, 0.0, 0.0), link)
+
+
+def create_data_area_light(location: Tuple[float, float, float] = (0.0, 0.0, 5.0),
+                           rotation: Tuple[float, float, float] = (0.0, 0.0, 0.0),
+                           size: float = 5.0,
+                           color: Tuple[float, float, float, float] = (1.00, 0.90, 0.80, 1.00),
+                           strength: float = 1000.0,
+                           name: Optional[str] = None,
+                           link: bool = True) -> bpy.types.Object:
+    '''
+    Same as create_area_light.
+    '''
+    name = "Area" if name is None else name
+    light = bpy.data.lights.new(name, 'AREA')
+    light.size = size
+    light.use_nodes = True
+    light.node_tree.nodes["Emission"].inputs["Color"].default_value = color
+    light.energy = strength
+
+    return _create_object(name, light, location, rotation, link)
+
+
+def create_data_sun_light(location: Tuple[float, float, float] = (0.0, 0.0, 5.0),
+                          rotation: Tuple[float, float, float] = (0.0, 0.0, 0.0),
+                          name: Optional[str] = None,
+                          link: bool = True) -> bpy.types.Object:
+    '''
+    Same as create_sun_light.
+    '''
+    name = "Sun" if name is None else name
+    light = bpy.data.lights.new(name, 'SUN')
+
+    return _create_object(name, light, location, rotation, link)
+
+
+def create_data_empty(location: Tuple[float, float, float] = (0.0, 0.0, 0.0),
+                      rotation: Tuple[float, float, float] = (0.0, 0.0, 0.0),
+                      name: str = "Empty",
+                      display_type: str = 'PLAIN_AXES',
+                      link: bool = True) -> bpy.types.Object:
+    '''
+    Same as bpy.ops.object.empty_add.
+    '''
+    current_object = _create_object(name, None, location, rotation, link)
+    current_object.empty_display_type = display_type
+
+    return current_object
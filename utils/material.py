@@ -1,5 +1,7 @@
 import bpy
-from typing import Tuple
+import hashlib
+import time
+from typing import Any, Tuple
 from utils.node import set_socket_value_range, arrange_nodes, create_frame_node, clean_nodes
 
 
@@ -575,3 +577,69 @@ def add_material(name: str = "Material",
         clean_nodes(material.node_tree.nodes)
 
     return material
+
+
+# Node-based material with a single Principled BSDF, copied by add_principled_material
+PRINCIPLED_TEMPLATE_NAME = "Principled_Template"
+
+# Number of principled materials kept between scenes, the least recently used ones beyond it are left to be purged
+MAX_PRINCIPLED_MATERIALS = 64
+
+
+def _principled_key(params: Any) -> Any:
+    # Parameters as plain floats, so that e.g. NumPy colors and tuples of the same values give the same key
+    if isinstance(params, dict):
+        return tuple((name, _principled_key(value)) for name, value in sorted(params.items()))
+    if hasattr(params, "__len__"):
+        return tuple(round(float(value), 6) for value in params)
+    return round(float(params), 6)
+
+
+def add_principled_material(check_existing: bool = True, **principled_params: Any) -> bpy.types.Material:
+    '''
+    Material of a single Principled BSDF node, keyed by its set_principled_node parameters, e.g. base_color (with
+    alpha), metallic, specular and roughness. With check_existing, the material made before for the same parameters
+    is returned, so that identical shaders are built and compiled once per session. New materials are copies of a
+    template material. The MAX_PRINCIPLED_MATERIALS most recently used ones keep a fake user, so purge_orphan_data
+    keeps them between scenes, while older ones are freed once no object uses them.
+    '''
+    key = hashlib.sha1(repr(_principled_key(principled_params)).encode()).hexdigest()[:12]
+    name = "Principled_" + key
+    if check_existing and name in bpy.data.materials:
+        material = bpy.data.materials[name]
+        material["last_used"] = time.time()
+        material.use_fake_user = True
+        return material
+
+    template = bpy.data.materials.get(PRINCIPLED_TEMPLATE_NAME)
+    if template is None:
+        template = add_material(PRINCIPLED_TEMPLATE_NAME, use_nodes=True, make_node_tree_empty=True)
+        output_node = template.node_tree.nodes.new(type='ShaderNodeOutputMaterial')
+        principled_node = template.node_tree.nodes.new(type='ShaderNodeBsdfPrincipled')
+        principled_node.name = "Principled BSDF"
+        template.node_tree.links.new(principled_node.outputs['BSDF'], output_node.inputs['Surface'])
+        template.use_fake_user = True
+
+    material = template.copy()
+    material.name = name
+    material["last_used"] = time.time()
+    material.use_fake_user = True
+    _release_principled_materials()
+
+    principled_node = material.node_tree.nodes["Principled BSDF"]
+    set_principled_node(principled_node=principled_node, **principled_params)
+
+    # Viewport display settings, used by the workbench engine
+    material.diffuse_color = principled_node.inputs['Base Color'].default_value
+    material.metallic = principled_node.inputs['Metallic'].default_value
+    material.roughness = principled_node.inputs['Roughness'].default_value
+
+    return material
+
+
+def _release_principled_materials() -> None:
+    # Drop the fake user of the least recently used materials beyond MAX_PRINCIPLED_MATERIALS
+    pinned = [material for material in bpy.data.materials if material.use_fake_user and "last_used" in material]
+    pinned.sort(key=lambda material: material["last_used"], reverse=True)
+    for material in pinned[MAX_PRINCIPLED_MATERIALS:]:
+        material.use_fake_user = False
@@ -1,6 +1,7 @@
 import bpy
 import math
-from typing import Tuple, Iterable, Optional, Sequence
+import numpy as np
+from typing import Tuple, Iterable, NamedTuple, Optional, Sequence, Union
 from utils.modifier import add_subdivision_surface_modifier
 
 
@@ -30,6 +31,137 @@ def create_mesh_from_pydata(scene: bpy.types.Scene,
     return new_object
 
 
+class MeshTopology(NamedTuple):
+    '''
+    Loops, polygons and edges of a (num_faces, face_size) face array, as int32 arrays ready for foreach_set.
+    '''
+    loop_vertices: np.ndarray
+    loop_edges: np.ndarray
+    loop_starts: np.ndarray
+    loop_totals: np.ndarray
+    edges: np.ndarray
+
+
+def compute_mesh_topology(faces: np.ndarray,
+                          num_vertices: Optional[int] = None,
+                          face_sizes: Optional[np.ndarray] = None) -> MeshTopology:
+    '''
+    Validate a (num_faces, face_size) face index array and derive its edges with NumPy. Pass the result to
+    create_mesh_from_numpy instead of the faces to share one topology between meshes without recomputing it.
+    Faces of mixed sizes are given as the (num_loops,) concatenated vertex indices and their (num_faces,) sizes.
+    '''
+    faces = np.asarray(faces)
+    if face_sizes is None:
+        if faces.ndim != 2 or faces.shape[1] < 3:
+            raise ValueError("Faces of shape (num_faces, face_size >= 3) are required.")
+        face_sizes = np.full(len(faces), faces.shape[1], dtype=np.int64)
+    else:
+        face_sizes = np.asarray(face_sizes, dtype=np.int64)
+        if faces.ndim != 1 or face_sizes.sum() != len(faces) or (face_sizes < 3).any():
+            raise ValueError("Faces of mixed sizes must be flat indices with face sizes >= 3 summing to their count.")
+    if faces.dtype.kind not in "iu":
+        raise ValueError("Face indices must be integers.")
+    if faces.size > 0 and (faces.min() < 0 or (num_vertices is not None and faces.max() >= num_vertices)):
+        raise ValueError("Face indices must be in [0, {}).".format(num_vertices))
+
+    loop_vertices = faces.ravel().astype(np.int64)
+    loop_starts = np.concatenate([[0], np.cumsum(face_sizes)[:-1]]).astype(np.int64)
+
+    # The edge of a loop runs from its vertex to the next vertex of the face
+    next_loops = np.arange(1, len(loop_vertices) + 1)
+    next_loops[loop_starts + face_sizes - 1] = loop_starts
+    starts, ends = loop_vertices, loop_vertices[next_loops]
+    low, high = np.minimum(starts, ends), np.maximum(starts, ends)
+    keys = low * (high.max(initial=0) + 1) + high
+    _, first_loops, loop_edges = np.unique(keys, return_index=True, return_inverse=True)
+    edges = np.stack([low[first_loops], high[first_loops]], axis=1)
+
+    return MeshTopology(loop_vertices=loop_vertices.astype(np.int32),
+                        loop_edges=loop_edges.ravel().astype(np.int32),
+                        loop_starts=loop_starts.astype(np.int32),
+                        loop_totals=face_sizes.astype(np.int32),
+                        edges=np.ascontiguousarray(edges, dtype=np.int32))
+
+
+def create_mesh_from_numpy(scene: bpy.types.Scene,
+                           vertices: np.ndarray,
+                           faces: Union[np.ndarray, MeshTopology],
+                           mesh_name: str,
+                           object_name: str,
+                           use_smooth: bool = True,
+                           face_sizes: Optional[np.ndarray] = None) -> bpy.types.Object:
+    '''
+    Same as create_mesh_from_pydata for (num_vertices, 3) vertex and (num_faces, face_size) face index arrays, or
+    flat face indices and face_sizes for faces of mixed sizes, see compute_mesh_topology.
+    Vertices, edges, loops, polygons and smooth flags are filled with foreach_set, without per-element Python.
+    float32 vertices are used without a copy. Faces can be a MeshTopology from compute_mesh_topology, meshes of the
+    same topology then skip the validation and the edge computation.
+    '''
+    vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+    topology = faces if isinstance(faces, MeshTopology) else compute_mesh_topology(faces, len(vertices), face_sizes)
+    num_faces = len(topology.loop_starts)
+
+    new_mesh: bpy.types.Mesh = bpy.data.meshes.new(mesh_name)
+    new_mesh.vertices.add(len(vertices))
+    new_mesh.vertices.foreach_set("co", vertices.ravel())
+    new_mesh.edges.add(len(topology.edges))
+    new_mesh.edges.foreach_set("vertices", topology.edges.ravel())
+    new_mesh.loops.add(len(topology.loop_vertices))
+    new_mesh.loops.foreach_set("vertex_index", topology.loop_vertices)
+    new_mesh.loops.foreach_set("edge_index", topology.loop_edges)
+    new_mesh.polygons.add(num_faces)
+    new_mesh.polygons.foreach_set("loop_start", topology.loop_starts)
+    # Polygon sizes follow from the loop starts since 4.0, where loop_total is read-only
+    if bpy.app.version < (4, 0, 0):
+        new_mesh.polygons.foreach_set("loop_total", topology.loop_totals)
+    new_mesh.polygons.foreach_set("use_smooth", np.full(num_faces, use_smooth, dtype=bool))
+    new_mesh.update()
+
+    new_object: bpy.types.Object = bpy.data.objects.new(object_name, new_mesh)
+    scene.collection.objects.link(new_object)
+
+    return new_object
+
+
+def set_mesh_vertices(mesh: bpy.types.Mesh, vertices: np.ndarray) -> None:
+    '''
+    Move all vertices of a mesh in place, the topology is kept. vertices: (num_vertices, 3)
+    '''
+    mesh.vertices.foreach_set("co", np.ascontiguousarray(vertices, dtype=np.float32).ravel())
+    mesh.update()
+
+
+def create_vertex_instances(scene: bpy.types.Scene,
+                            locations: Iterable[Iterable[float]],
+                            instance_object: bpy.types.Object,
+                            name: str = "Instances") -> bpy.types.Object:
+    '''
+    Instance `instance_object` at every location, using the vertices of a point-only mesh as the instancer.
+    All instances share the data of `instance_object`, so memory does not grow with the number of locations.
+    The returned instancer is hidden; move the instances with set_mesh_vertices on its data.
+
+    https://docs.blender.org/manual/en/latest/scene_layout/object/properties/instancing/verts.html
+    '''
+    points = np.asarray(locations, dtype=np.float32).reshape(-1, 3)
+
+    new_mesh: bpy.types.Mesh = bpy.data.meshes.new(name)
+    new_mesh.vertices.add(len(points))
+    new_mesh.vertices.foreach_set("co", points.ravel())
+    new_mesh.update()
+
+    new_object: bpy.types.Object = bpy.data.objects.new(name, new_mesh)
+    scene.collection.objects.link(new_object)
+    new_object.instance_type = 'VERTS'
+    new_object.show_instancer_for_render = False
+    new_object.show_instancer_for_viewport = False
+
+    # Instances are placed relative to each vertex
+    instance_object.parent = new_object
+    instance_object.location = (0.0, 0.0, 0.0)
+
+    return new_object
+
+
 def create_cached_mesh_from_alembic(file_path: str, name: str) -> bpy.types.Object:
     bpy.ops.wm.alembic_import(filepath=file_path, as_background_job=False)
     bpy.context.active_object.name = name
@@ -54,8 +186,14 @@ def create_plane(location: Tuple[float, float, float] = (0.0, 0.0, 0.0),
 def create_smooth_sphere(location: Tuple[float, float, float] = (0.0, 0.0, 0.0),
                          radius: float = 1.0,
                          subdivision_level: int = 1,
-                         name: Optional[str] = None) -> bpy.types.Object:
-    bpy.ops.mesh.primitive_uv_sphere_add(radius=radius, location=location, calc_uvs=True)
+                         name: Optional[str] = None,
+                         segments: int = 32,
+                         ring_count: int = 16) -> bpy.types.Object:
+    bpy.ops.mesh.primitive_uv_sphere_add(segments=segments,
+                                         ring_count=ring_count,
+                                         radius=radius,
+                                         location=location,
+                                         calc_uvs=True)
 
     current_object = bpy.context.object
 
@@ -63,7 +201,8 @@ def create_smooth_sphere(location: Tuple[float, float, float] = (0.0, 0.0, 0.0),
         current_object.name = name
 
     set_smooth_shading(current_object.data)
-    add_subdivision_surface_modifier(current_object, subdivision_level)
+    if subdivision_level > 0:
+        add_subdivision_surface_modifier(current_object, subdivision_level)
 
     return current_object
 
@@ -1,7 +1,8 @@
 import bpy
 import sys
 import math
-from typing import Iterable
+import numpy as np
+from typing import Iterable, List
 
 
 def create_frame_node(node_tree: bpy.types.NodeTree,
@@ -34,160 +35,188 @@ def clean_nodes(nodes: bpy.types.Nodes) -> None:
         nodes.remove(node)
 
 
-def arrange_nodes(node_tree: bpy.types.NodeTree, verbose: bool = False) -> None:
-    max_num_iters = 2000
-    epsilon = 1e-05
-    target_space = 50.0
+# Whether arrange_nodes skips the layout in background mode, see set_node_layout_headless
+_skip_headless_node_layout = False
 
-    second_stage = False
 
-    fix_horizontal_location = True
-    fix_vertical_location = True
-    fix_overlaps = True
+def set_node_layout_headless(skip: bool) -> None:
+    '''
+    Make arrange_nodes skip the layout when Blender runs in background mode, for scripts that only render and never
+    save or show the node trees. Off by default, so that .blend files saved from background runs stay readable.
+    '''
+    global _skip_headless_node_layout
+    _skip_headless_node_layout = skip
+
+
+def arrange_nodes(node_tree: bpy.types.NodeTree, verbose: bool = False) -> None:
+    '''
+    Lay out the nodes of a tree left to right along their links without overlaps. Node locations and sizes are read
+    into NumPy once, the constraints are solved with vectorized updates and the locations are written back once.
+    '''
+    nodes = node_tree.nodes
+    if (_skip_headless_node_layout and bpy.app.background) or len(nodes) == 0:
+        return
 
     if verbose:
         print("-----------------")
         print("Target nodes:")
-        for node in node_tree.nodes:
+        for node in nodes:
             print("- " + node.name)
 
+    num_nodes = len(nodes)
+    locations = np.empty(num_nodes * 2, dtype=np.float32)
+    nodes.foreach_get("location", locations)
+    widths = np.empty(num_nodes, dtype=np.float32)
+    nodes.foreach_get("width", widths)
+    dimensions = np.empty(num_nodes * 2, dtype=np.float32)
+    nodes.foreach_get("dimensions", dimensions)
+    heights = np.empty(num_nodes, dtype=np.float32)
+    nodes.foreach_get("height", heights)
+
+    # Note: "dimensions" and "height" may not be correct depending on the situation
+    dimension_heights = dimensions.reshape(-1, 2)[:, 1]
+    heights = np.where(dimension_heights > 1e-05, dimension_heights,
+                       np.where(np.abs(heights - 100.0) > 1e-05, heights, 200.0))
+
+    node_indices = {node.name: index for index, node in enumerate(nodes)}
+    links = list(node_tree.links)
+    link_nodes = np.array([[node_indices[link.from_node.name], node_indices[link.to_node.name]] for link in links],
+                          dtype=np.int64).reshape(-1, 2)
+    link_sockets = np.array(
+        [[list(link.from_node.outputs).index(link.from_socket),
+          list(link.to_node.inputs).index(link.to_socket)] for link in links],
+        dtype=np.float64).reshape(-1, 2)
+
+    solved = solve_node_layout(locations.reshape(-1, 2), widths, heights, link_nodes, link_sockets, verbose)
+    nodes.foreach_set("location", solved.astype(np.float32).ravel())
+
+
+def _disjoint_batches(pairs: np.ndarray) -> List[np.ndarray]:
+    # Split (num_pairs, 2) node pairs into batches in which every node appears at most once, so that the constraints
+    # of a batch are solved at once and the batches one after another, like Gauss-Seidel iterations
+    batches = []
+    remaining = np.arange(len(pairs))
+    while len(remaining) > 0:
+        flat = pairs[remaining].ravel()
+        _, first_occurrences = np.unique(flat, return_index=True)
+        is_first = np.zeros(len(flat), dtype=bool)
+        is_first[first_occurrences] = True
+        selected = is_first.reshape(-1, 2).all(axis=1)
+        batches.append(remaining[selected])
+        remaining = remaining[~selected]
+    return batches
+
+
+def _overlap_pairs(centers: np.ndarray, cell_size: float) -> np.ndarray:
+    # Spatial hashing, only nodes in the same or neighboring cells can overlap. Cells are looked up in the sorted
+    # cell keys, half of the neighbors are enough to find every pair once
+    cells = np.floor(centers / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    stride = int(cells[:, 1].max()) + 3
+    keys = cells[:, 0] * stride + cells[:, 1] + 1
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    pairs = []
+    for offset in (0, stride - 1, stride, stride + 1, 1):
+        neighbor_keys = keys + offset
+        starts = np.searchsorted(sorted_keys, neighbor_keys, side="left")
+        counts = np.searchsorted(sorted_keys, neighbor_keys, side="right") - starts
+        first = np.repeat(np.arange(len(keys)), counts)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        second = order[np.repeat(starts, counts) + within]
+        keep = first < second if offset == 0 else np.ones(len(first), dtype=bool)
+        pairs.append(np.stack([first[keep], second[keep]], axis=1))
+    return np.concatenate(pairs)
+
+
+def solve_node_layout(locations: np.ndarray,
+                      widths: np.ndarray,
+                      heights: np.ndarray,
+                      link_nodes: np.ndarray,
+                      link_sockets: np.ndarray,
+                      verbose: bool = False) -> np.ndarray:
+    '''
+    Position based constraint solver behind arrange_nodes, on NumPy arrays only. Constraints are split into batches
+    without shared nodes, each batch is solved with vectorized updates.
+
+    locations: (num_nodes, 2) top left corners, widths and heights: (num_nodes,),
+    link_nodes and link_sockets: (num_links, 2) from and to node and socket indices.
+    Returns the (num_nodes, 2) solved locations.
+    '''
+    max_num_iters = 2000
+    epsilon = 1e-05
+    target_space = 50.0
+    socket_offset = 20.0
+
+    locations = np.array(locations, dtype=np.float64)
+    widths = np.asarray(widths, dtype=np.float64)
+    heights = np.asarray(heights, dtype=np.float64)
+    link_nodes = np.asarray(link_nodes, dtype=np.int64).reshape(-1, 2)
+    link_offsets = socket_offset * np.asarray(link_sockets, dtype=np.float64).reshape(-1, 2)
+    x, y = locations[:, 0], locations[:, 1]
+    link_batches = [(link_nodes[batch, 0], link_nodes[batch, 1], link_offsets[batch])
+                    for batch in _disjoint_batches(link_nodes)]
+
+    second_stage = False
+    num_collisions = 0
+
     # In the first stage, expand nodes overly
     target_space *= 2.0
 
-    # Gauss-Seidel-style iterations
     previous_squared_deltas_sum = sys.float_info.max
     for i in range(max_num_iters):
         squared_deltas_sum = 0.0
 
-        if fix_horizontal_location:
-            for link in node_tree.links:
-                k = 0.9 if not second_stage else 0.5
-                threshold_factor = 2.0
-
-                x_from = link.from_node.location[0]
-                x_to = link.to_node.location[0]
-                w_from = link.from_node.width
-                signed_space = x_to - x_from - w_from
-                C = signed_space - target_space
-                grad_C_x_from = -1.0
-                grad_C_x_to = 1.0
-
-                # Skip if the distance is sufficiently large
-                if C >= target_space * threshold_factor:
-                    continue
-
-                lagrange = C / (grad_C_x_from * grad_C_x_from + grad_C_x_to * grad_C_x_to)
-                delta_x_from = -lagrange * grad_C_x_from
-                delta_x_to = -lagrange * grad_C_x_to
-
-                link.from_node.location[0] += k * delta_x_from
-                link.to_node.location[0] += k * delta_x_to
-
-                squared_deltas_sum += k * k * (delta_x_from * delta_x_from + delta_x_to * delta_x_to)
-
-        if fix_vertical_location:
-            k = 0.5 if not second_stage else 0.05
-            socket_offset = 20.0
-
-            def get_from_socket_index(node: bpy.types.Node, node_socket: bpy.types.NodeSocket) -> int:
-                for i in range(len(node.outputs)):
-                    if node.outputs[i] == node_socket:
-                        return i
-                assert False
-
-            def get_to_socket_index(node: bpy.types.Node, node_socket: bpy.types.NodeSocket) -> int:
-                for i in range(len(node.inputs)):
-                    if node.inputs[i] == node_socket:
-                        return i
-                assert False
-
-            for link in node_tree.links:
-                from_socket_index = get_from_socket_index(link.from_node, link.from_socket)
-                to_socket_index = get_to_socket_index(link.to_node, link.to_socket)
-                y_from = link.from_node.location[1] - socket_offset * from_socket_index
-                y_to = link.to_node.location[1] - socket_offset * to_socket_index
-                C = y_from - y_to
-                grad_C_y_from = 1.0
-                grad_C_y_to = -1.0
-                lagrange = C / (grad_C_y_from * grad_C_y_from + grad_C_y_to * grad_C_y_to)
-                delta_y_from = -lagrange * grad_C_y_from
-                delta_y_to = -lagrange * grad_C_y_to
-
-                link.from_node.location[1] += k * delta_y_from
-                link.to_node.location[1] += k * delta_y_to
-
-                squared_deltas_sum += k * k * (delta_y_from * delta_y_from + delta_y_to * delta_y_to)
-
-        if fix_overlaps and second_stage:
+        # Horizontal space between linked nodes, skipped if the distance is sufficiently large
+        k = 0.9 if not second_stage else 0.5
+        for from_nodes, to_nodes, _ in link_batches:
+            C = x[to_nodes] - x[from_nodes] - widths[from_nodes] - target_space
+            delta = np.where(C < target_space * 2.0, 0.5 * k * C, 0.0)
+            x[from_nodes] += delta
+            x[to_nodes] -= delta
+            squared_deltas_sum += 2.0 * float(np.dot(delta, delta))
+
+        # Vertical alignment of linked sockets
+        k = 0.5 if not second_stage else 0.05
+        for from_nodes, to_nodes, offsets in link_batches:
+            C = (y[from_nodes] - offsets[:, 0]) - (y[to_nodes] - offsets[:, 1])
+            delta = 0.5 * k * C
+            y[from_nodes] -= delta
+            y[to_nodes] += delta
+            squared_deltas_sum += 2.0 * float(np.dot(delta, delta))
+
+        if second_stage:
             k = 0.9
             margin = 0.5 * target_space
-
-            # Examine all node pairs
-            for node_1 in node_tree.nodes:
-                for node_2 in node_tree.nodes:
-                    if node_1 == node_2:
-                        continue
-
-                    x_1 = node_1.location[0]
-                    x_2 = node_2.location[0]
-                    w_1 = node_1.width
-                    w_2 = node_2.width
-                    cx_1 = x_1 + 0.5 * w_1
-                    cx_2 = x_2 + 0.5 * w_2
-                    rx_1 = 0.5 * w_1 + margin
-                    rx_2 = 0.5 * w_2 + margin
-
-                    # Note: "dimensions" and "height" may not be correct depending on the situation
-                    def get_height(node: bpy.types.Node) -> float:
-                        if node.dimensions.y > epsilon:
-                            return node.dimensions.y
-                        elif math.fabs(node.height - 100.0) > epsilon:
-                            return node.height
-                        else:
-                            return 200.0
-
-                    y_1 = node_1.location[1]
-                    y_2 = node_2.location[1]
-                    h_1 = get_height(node_1)
-                    h_2 = get_height(node_2)
-                    cy_1 = y_1 - 0.5 * h_1
-                    cy_2 = y_2 - 0.5 * h_2
-                    ry_1 = 0.5 * h_1 + margin
-                    ry_2 = 0.5 * h_2 + margin
-
-                    C_x = math.fabs(cx_1 - cx_2) - (rx_1 + rx_2)
-                    C_y = math.fabs(cy_1 - cy_2) - (ry_1 + ry_2)
-
-                    # If no collision, just skip
-                    if C_x >= 0.0 or C_y >= 0.0:
-                        continue
-
-                    # Solve collision for the "easier" direction
-                    if C_x > C_y:
-                        grad_C_x_1 = 1.0 if cx_1 - cx_2 >= 0.0 else -1.0
-                        grad_C_x_2 = -1.0 if cx_1 - cx_2 >= 0.0 else 1.0
-                        lagrange = C_x / (grad_C_x_1 * grad_C_x_1 + grad_C_x_2 * grad_C_x_2)
-                        delta_x_1 = -lagrange * grad_C_x_1
-                        delta_x_2 = -lagrange * grad_C_x_2
-
-                        node_1.location[0] += k * delta_x_1
-                        node_2.location[0] += k * delta_x_2
-
-                        squared_deltas_sum += k * k * (delta_x_1 * delta_x_1 + delta_x_2 * delta_x_2)
-                    else:
-                        grad_C_y_1 = 1.0 if cy_1 - cy_2 >= 0.0 else -1.0
-                        grad_C_y_2 = -1.0 if cy_1 - cy_2 >= 0.0 else 1.0
-                        lagrange = C_y / (grad_C_y_1 * grad_C_y_1 + grad_C_y_2 * grad_C_y_2)
-                        delta_y_1 = -lagrange * grad_C_y_1
-                        delta_y_2 = -lagrange * grad_C_y_2
-
-                        node_1.location[1] += k * delta_y_1
-                        node_2.location[1] += k * delta_y_2
-
-                        squared_deltas_sum += k * k * (delta_y_1 * delta_y_1 + delta_y_2 * delta_y_2)
+            radii = np.stack([0.5 * widths + margin, 0.5 * heights + margin], axis=1)
+            centers = np.stack([x + 0.5 * widths, y - 0.5 * heights], axis=1)
+            pairs = _overlap_pairs(centers, 2.0 * float(radii.max()))
+            C = np.abs(centers[pairs[:, 0]] - centers[pairs[:, 1]]) - (radii[pairs[:, 0]] + radii[pairs[:, 1]])
+            pairs = pairs[(C < 0.0).all(axis=1)]
+
+            num_collisions = 0
+            for batch in _disjoint_batches(pairs):
+                first, second = pairs[batch, 0], pairs[batch, 1]
+                centers = np.stack([x + 0.5 * widths, y - 0.5 * heights], axis=1)
+                offsets = centers[first] - centers[second]
+                C = np.abs(offsets) - (radii[first] + radii[second])
+                colliding = (C < 0.0).all(axis=1)
+                num_collisions += int(colliding.sum())
+
+                # Solve collision for the "easier" direction
+                horizontal = C[:, 0] > C[:, 1]
+                signs = np.where(offsets >= 0.0, 1.0, -1.0)
+                for axis, values, mask in ((0, x, colliding & horizontal), (1, y, colliding & ~horizontal)):
+                    delta = np.where(mask, -0.5 * k * C[:, axis] * signs[:, axis], 0.0)
+                    values[first] += delta
+                    values[second] -= delta
+                    squared_deltas_sum += 2.0 * float(np.dot(delta, delta))
 
         if verbose:
             print("Iteration #" + str(i) + ": " + str(previous_squared_deltas_sum - squared_deltas_sum))
+            if second_stage:
+                print("Collisions: " + str(num_collisions))
 
         # Check the termination conditiion
         if math.fabs(previous_squared_deltas_sum - squared_deltas_sum) < epsilon:
@@ -198,3 +227,5 @@ def arrange_nodes(node_tree: bpy.types.NodeTree, verbose: bool = False) -> None:
                 second_stage = True
 
         previous_squared_deltas_sum = squared_deltas_sum
+
+    return locations
@@ -1,6 +1,7 @@
 import bpy
 import math
-from typing import Optional, Tuple
+import numpy as np
+from typing import Dict, Iterable, Optional, Tuple
 from utils.node import arrange_nodes
 
 ################################################################################
@@ -28,6 +29,9 @@ def create_text(
     new_text_data.align_x = align_x
     new_text_data.align_y = align_y
     new_text_data.size = size
+    if font_name == "Bfont" and font_name not in bpy.data.fonts:
+        # The builtin font is only loaded once a text object is added through the UI or operators
+        bpy.data.fonts.load("<builtin>")
     new_text_data.font = bpy.data.fonts[font_name]
     new_text_data.space_line = space_line
     new_text_data.extrude = extrude
@@ -57,6 +61,46 @@ def set_animation(scene: bpy.types.Scene,
     scene.frame_current = frame_current
 
 
+def set_keyframes(id_data: bpy.types.ID,
+                  data_path: str,
+                  frames: np.ndarray,
+                  values: np.ndarray,
+                  interpolation: str = 'BEZIER') -> None:
+    '''
+    Keyframe a (vector) property at many frames at once. The F-curves are filled with foreach_set, which is much
+    faster than calling keyframe_insert per frame. Existing F-curves of the same property are replaced.
+
+    frames: (num_frames,) frame numbers, values: (num_frames,) or (num_frames, array_length) property values.
+    interpolation: 'CONSTANT', 'LINEAR' or 'BEZIER' between the keyframes.
+    https://docs.blender.org/api/current/bpy.types.FCurveKeyframePoints.html
+    '''
+    if id_data.animation_data is None:
+        id_data.animation_data_create()
+    if id_data.animation_data.action is None:
+        id_data.animation_data.action = bpy.data.actions.new(name=id_data.name + "Action")
+    fcurves = id_data.animation_data.action.fcurves
+
+    frames = np.asarray(frames, dtype=np.float32)
+    values = np.asarray(values, dtype=np.float32).reshape(len(frames), -1)
+
+    co = np.empty((len(frames), 2), dtype=np.float32)
+    co[:, 0] = frames
+    # Enum values of Keyframe.interpolation, the first three of them
+    interpolation_values = [('CONSTANT', 'LINEAR', 'BEZIER').index(interpolation)] * len(frames)
+    for index in range(values.shape[1]):
+        fcurve = fcurves.find(data_path, index=index)
+        if fcurve is not None:
+            fcurves.remove(fcurve)
+        fcurve = fcurves.new(data_path, index=index)
+
+        co[:, 1] = values[:, index]
+        fcurve.keyframe_points.add(len(frames))
+        fcurve.keyframe_points.foreach_set("co", co.ravel())
+        if interpolation != 'BEZIER':
+            fcurve.keyframe_points.foreach_set("interpolation", interpolation_values)
+        fcurve.update()
+
+
 def build_rgb_background(world: bpy.types.World,
                          rgb: Tuple[float, float, float, float] = (0.9, 0.9, 0.9, 1.0),
                          strength: float = 1.0) -> None:
@@ -111,7 +155,8 @@ def set_cycles_renderer(scene: bpy.types.Scene,
                         use_motion_blur: bool = False,
                         use_transparent_bg: bool = False,
                         prefer_cuda_use: bool = True,
-                        use_adaptive_sampling: bool = False) -> None:
+                        use_adaptive_sampling: bool = False,
+                        use_cpu_only: bool = False) -> None:
     scene.camera = camera_object
 
     scene.render.image_settings.file_format = 'PNG'
@@ -124,6 +169,11 @@ def set_cycles_renderer(scene: bpy.types.Scene,
     scene.cycles.use_adaptive_sampling = use_adaptive_sampling
     scene.cycles.samples = num_samples
 
+    if use_cpu_only:
+        # Skip probing the devices, it is slow and not needed on CPU only machines
+        scene.cycles.device = "CPU"
+        return
+
     # Enable GPU acceleration
     # Source - https://blender.stackexchange.com/a/196702
     if prefer_cuda_use:
@@ -147,6 +197,69 @@ def set_cycles_renderer(scene: bpy.types.Scene,
     print("----")
 
 
+def set_cpu_performance(scene: bpy.types.Scene, num_threads: int = 0, tile_size: Optional[int] = None) -> None:
+    '''
+    num_threads: 0 uses all cores
+    tile_size: render tile edge in pixels, None keeps the current one
+    '''
+    scene.render.threads_mode = 'FIXED' if num_threads > 0 else 'AUTO'
+    if num_threads > 0:
+        scene.render.threads = num_threads
+
+    if tile_size is not None:
+        if hasattr(scene.render, "tile_x"):
+            scene.render.tile_x = tile_size
+            scene.render.tile_y = tile_size
+        else:
+            # Blender 3.0+ renders progressively with a single tile size
+            scene.cycles.use_auto_tile = True
+            scene.cycles.tile_size = tile_size
+
+
+def set_eevee_renderer(scene: bpy.types.Scene,
+                       camera_object: bpy.types.Object,
+                       num_samples: int,
+                       use_transparent_bg: bool = False,
+                       use_soft_shadows: bool = True,
+                       use_ambient_occlusion: bool = True) -> None:
+    '''
+    Rasterized preview renderer, which uses the same principled materials and lights as Cycles.
+    Eevee needs an OpenGL context, also in background mode.
+    https://docs.blender.org/api/current/bpy.types.SceneEEVEE.html
+    '''
+    scene.camera = camera_object
+
+    scene.render.image_settings.file_format = 'PNG'
+    scene.render.engine = 'BLENDER_EEVEE'
+    scene.render.film_transparent = use_transparent_bg
+
+    scene.eevee.taa_render_samples = num_samples
+    scene.eevee.use_soft_shadows = use_soft_shadows
+    scene.eevee.use_gtao = use_ambient_occlusion
+
+
+def set_workbench_renderer(scene: bpy.types.Scene,
+                           camera_object: bpy.types.Object,
+                           use_transparent_bg: bool = False,
+                           use_shadows: bool = True,
+                           anti_aliasing: str = '8') -> None:
+    '''
+    Fastest preview renderer, objects are shaded with studio lighting and the viewport display color,
+    metallic and roughness of their materials.
+    https://docs.blender.org/api/current/bpy.types.View3DShading.html
+    '''
+    scene.camera = camera_object
+
+    scene.render.image_settings.file_format = 'PNG'
+    scene.render.engine = 'BLENDER_WORKBENCH'
+    scene.render.film_transparent = use_transparent_bg
+
+    scene.display.render_aa = anti_aliasing
+    scene.display.shading.light = 'STUDIO'
+    scene.display.shading.color_type = 'MATERIAL'
+    scene.display.shading.show_shadows = use_shadows
+
+
 ################################################################################
 # Constraints
 ################################################################################
@@ -207,3 +320,70 @@ def append_material(blend_file_path: str, material_name: str) -> bool:
 def clean_objects() -> None:
     for item in bpy.data.objects:
         bpy.data.objects.remove(item)
+
+
+# bpy.data collections that purge_orphan_data looks through, missing ones are skipped on older versions
+ORPHAN_DATA_COLLECTIONS = (
+    "objects",
+    "collections",
+    "meshes",
+    "curves",
+    "metaballs",
+    "lattices",
+    "armatures",
+    "grease_pencils",
+    "fonts",
+    "materials",
+    "textures",
+    "images",
+    "node_groups",
+    "lights",
+    "cameras",
+    "actions",
+    "worlds",
+    "particles",
+)
+
+
+def purge_orphan_data(keep: Iterable[bpy.types.ID] = ()) -> Dict[str, int]:
+    '''
+    Remove the datablocks without users, repeatedly since removing e.g. a mesh leaves its materials without users.
+    Datablocks in keep, with a fake user, and the Render Result and Viewer Node images are kept.
+
+    Returns the number of removed datablocks per bpy.data collection, e.g. {"meshes": 12, "materials": 2}.
+    https://docs.blender.org/api/current/bpy.types.BlendData.html#bpy.types.BlendData.batch_remove
+    '''
+    keep = set(keep)
+    freed: Dict[str, int] = {}
+    while True:
+        orphans = []
+        for collection_name in ORPHAN_DATA_COLLECTIONS:
+            for datablock in getattr(bpy.data, collection_name, ()):
+                if datablock.users > 0 or datablock in keep:
+                    continue
+                if collection_name == "images" and datablock.type in ('RENDER_RESULT', 'COMPOSITING'):
+                    continue
+                orphans.append(datablock)
+                freed[collection_name] = freed.get(collection_name, 0) + 1
+        if not orphans:
+            return freed
+        bpy.data.batch_remove(orphans)
+
+
+def clean_scene(keep: Iterable[bpy.types.ID] = ()) -> Dict[str, int]:
+    '''
+    Remove all objects but those in keep, then everything they leave without users, see purge_orphan_data.
+    Unlike clean_objects, long running sessions do not pile up meshes, curves, materials and actions.
+
+    Returns the number of removed datablocks per bpy.data collection, objects included.
+    '''
+    keep = set(keep)
+    objects = [obj for obj in bpy.data.objects if obj not in keep]
+    freed: Dict[str, int] = {}
+    if objects:
+        bpy.data.batch_remove(objects)
+        freed["objects"] = len(objects)
+
+    for collection_name, count in purge_orphan_data(keep).items():
+        freed[collection_name] = freed.get(collection_name, 0) + count
+    return freed